@@ -5,60 +5,309 @@ Generates comprehensive, educational algorithm explanations using LLM.
 Produces structured JSON data for the Algorithm Deep Dive feature.
 """
 
-import json
-import os
+import asyncio
+import logging
+import pathlib
 import re
 from typing import Optional
+
+import aiofiles
+import fastjsonschema
+import orjson
+from aiofiles.os import path as aio_path
+
+from app.cache.memory_cache import MemoryCache
 from app.utils.llm_provider import llm
 from app.utils.logger import get_logger
 
 logger = get_logger("algorithm_explainer")
 
-# Cache directory for generated algorithms
-CACHE_DIR = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'public', 'algorithms')
+# Cache directory for generated algorithms - resolved to an absolute path
+# once at import, and created up front so writes skip the per-call makedirs
+CACHE_DIR = pathlib.Path(__file__).resolve().parents[3] / 'public' / 'algorithms'
+try:
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+except OSError as e:
+    logger.warning("Could not create cache directory %s: %s", CACHE_DIR, e)
+
+# In-process memoization of parsed cache files, keyed by algorithm_id.
+# Repeat hits never touch disk - the event loop stays free for LLM calls.
+# LRU-bounded with a TTL so a long-running worker can't grow without limit.
+_MEM_CACHE = MemoryCache(max_size=256, default_ttl=3600)
+
+# In-flight generations keyed by algorithm_id. Concurrent cold requests for
+# the same algorithm await the first caller's Future instead of each firing
+# their own (billable) LLM call.
+_INFLIGHT: dict = {}
+
+# Background disk writes spawned by _spawn_cache_write. Tracked so the tasks
+# are not garbage-collected mid-write and can be flushed at shutdown.
+_PENDING_WRITES: set = set()
+
+# Precompiled at import time - normalize_algorithm_id is called from every
+# entry point, so avoid per-call pattern lookup and list construction.
+_NORMALIZE_RE = re.compile(r'[^a-z0-9]+')
+_SUFFIXES = ('_approach', '_algorithm', '_technique', '_method', '_optimization')
+
+# Aliases mapping normalized names to the cache file they share - tried
+# before the derived suffix variants when resolving a cache ID
+_MAPPINGS: dict = {
+    'monotonic_stack': 'stack_based_optimization',
+    'stack': 'stack_based_optimization',
+    'two_pointers': 'two_pointer',
+    'hashmap': 'hash_map',
+    'hash_table': 'hash_map',
+    'binary_search_tree': 'binary_search',
+    'morris_traversal_for_constant_space': 'morris_traversal',
+    'morris_traversal_space_optimized': 'morris_traversal',
+    'optimized_in_order_traversal': 'morris_traversal',
+    'constant_space_traversal': 'morris_traversal',
+}
+
+# Well-known algorithms where the fast/cheap model tier produces equally
+# good structured output - reserve the pro tier for unusual requests
+_SIMPLE_ALGOS = frozenset({
+    'binary_search', 'linear_search', 'bfs', 'dfs', 'breadth_first_search',
+    'depth_first_search', 'bubble_sort', 'insertion_sort', 'selection_sort',
+    'merge_sort', 'mergesort', 'quick_sort', 'quicksort', 'heap_sort',
+    'two_pointer', 'sliding_window', 'hash_map', 'stack', 'queue',
+    'stack_based_optimization', 'prefix_sum', 'kadane', 'fibonacci',
+    'two_sum', 'binary_tree_traversal', 'morris_traversal',
+})
+
+# Markdown code fences occasionally wrap LLM JSON output despite json_mode
+_FENCE_RE = re.compile(r'^\s*```(?:json)?\s*|\s*```\s*$', re.DOTALL)
+
+
+# The schema prompt is frozen once at import and filled with a single
+# format call. The invariant block leads and the per-request fields sit in
+# a short footer, so provider-side prompt prefix caching can reuse the KV
+# state of the whole schema across requests.
+_PROMPT_TMPL = """You are an expert computer science educator. Generate a comprehensive, educational explanation for the algorithm named at the END of this message.
+
+Return ONE valid JSON object following this schema exactly. Element shapes are shown once - repeat them to the counts noted in comments.
+
+{{
+  "algorithm_id": "<the ID given at the end>",
+  "name": "<the algorithm name given at the end>",
+  "display_name": "<the algorithm name given at the end>",
+  "category": "e.g. 'Divide and Conquer', 'Dynamic Programming', 'Greedy', 'Graph Traversal', 'Monotonic Stack'",
+  "tags": ["tag1", "tag2", "tag3", "tag4"],
+  "overview": {{
+    "core_idea": "What this algorithm does and WHY it works. 2-3 sentences.",
+    "when_to_use": ["4 specific conditions when this algorithm is ideal"],
+    "real_world_analogy": "A memorable analogy, like explaining to a smart 12-year-old."
+  }},
+  "visual_explanation": {{
+    "steps": [{{"title": "...", "description": "what happens and why", "array": [2, 1, 5, 6, 2, 3], "highlight": "init"}}]
+  }},
+  "pseudocode": {{
+    "language": "generic",
+    "code": "function algorithmName(input):\\n    ...",
+    "annotations": [{{"line": 1, "text": "what this line does"}}],
+    "variables": [{{"name": "variableName", "description": "what it stores"}}],
+    "key_operations": ["3 key operation descriptions"],
+    "return_values": [{{"value": "result", "condition": "when successful"}}, {{"value": "-1 or null", "condition": "when not found/failed"}}],
+    "flow_steps": ["Initialize", "Process", "Check Condition", "Update State", "Return Result"]
+  }},
+  "complexity": {{
+    "time": {{
+      "best": "O(?)", "average": "O(?)", "worst": "O(?)",
+      "explanation": "WHY this is the time complexity",
+      "comparison_data": [{{"n": 10, "optimized": 10, "bruteforce": 100}}]
+    }},
+    "space": {{"complexity": "O(?)", "explanation": "what extra space is used and why"}}
+  }},
+  "variations": [{{"name": "...", "description": "...", "use_case": "...", "example": {{"input": "...", "output": "..."}}, "key_change": "..."}}],
+  "common_pitfalls": [{{"title": "Pitfall: ...", "problem": "...", "bad_code": "...", "good_code": "...", "explanation": "why the fix works"}}],
+  "practice_exercise": {{
+    "title": "Hands-on Practice: ...",
+    "description": "Walk through the algorithm step by step on this example.",
+    "array": [3, 1, 4, 1, 5, 9, 2, 6],
+    "target": "relevant target or goal",
+    "steps": [{{"question": "...", "hint": "...", "options": ["A", "B", "C", "D"], "correct": 0, "explanation": "..."}}]
+  }},
+  "pro_tips": ["5 practical interview/optimization/debugging tips"],
+  "related_problems": ["5 problem names (LeetCode number if applicable)"]
+}}
+
+Counts: visual_explanation.steps walks one complete example with actual data (4+ steps); pseudocode.annotations covers 5+ lines; comparison_data has 4 rows of realistic operation counts; 2 variations; 3 common_pitfalls with actual code; practice_exercise.steps has 4 interactive questions.
+
+Rules: (1) be educational - assume first exposure (2) use concrete numbers, not abstract descriptions (3) valid JSON only - escape quotes, use \\n for newlines in code strings.
+
+Return ONLY the JSON object, no markdown code blocks or extra text.
+
+Algorithm: {algorithm_name}
+ID: {algorithm_id}
+{context_line}"""
+
+_SYSTEM_INSTRUCTION = "You are an expert computer science educator specializing in algorithms and data structures."
+
+# Structural contract for generated explanations. Compiled to Python
+# bytecode at import (fastjsonschema), so the per-response check is cheap.
+# Deep content is left to the model; we only reject payloads the frontend
+# cannot render.
+_ALGO_SCHEMA = {
+    'type': 'object',
+    'required': ['name', 'category', 'overview', 'pseudocode', 'complexity'],
+    'properties': {
+        'algorithm_id': {'type': 'string'},
+        'name': {'type': 'string'},
+        'category': {'type': 'string'},
+        'tags': {'type': 'array'},
+        'overview': {'type': 'object'},
+        'visual_explanation': {'type': 'object'},
+        'pseudocode': {'type': 'object'},
+        'complexity': {'type': 'object'},
+        'variations': {'type': 'array'},
+        'common_pitfalls': {'type': 'array'},
+        'practice_exercise': {'type': 'object'},
+        'pro_tips': {'type': 'array'},
+        'related_problems': {'type': 'array'},
+    },
+}
+_VALIDATE_ALGO = fastjsonschema.compile(_ALGO_SCHEMA)
+
+
+def _strip_fences(response: str) -> str:
+    """Remove markdown code fences around an LLM JSON response."""
+    return _FENCE_RE.sub('', response).strip()
+
+
+async def _call_and_cache(provider, prompt: str, algorithm_id: str, algorithm_name: str,
+                          model_tier: str = "pro") -> dict:
+    """
+    Shared LLM -> strip fences -> parse -> cache tail for all entry points.
+
+    Streams when the provider supports it (the module singleton does),
+    otherwise falls back to a plain call. Any parse/validation win applied
+    here benefits every caller at once.
+    """
+    stream = getattr(provider, 'stream', None)
+    # Tiered models are a module-singleton feature; pipeline providers
+    # (BaseLLMProvider) expose neither stream nor a model_tier kwarg
+    tier_kwargs = {"model_tier": model_tier} if stream is not None else {}
+    if stream is not None:
+        # Chunks accumulate as they are generated so parsing starts the
+        # moment the last token arrives
+        buf = []
+        async for chunk in stream(prompt, system_instruction=_SYSTEM_INSTRUCTION,
+                                  json_mode=True, model_tier=model_tier):
+            buf.append(chunk)
+        response = ''.join(buf)
+    else:
+        response = await provider.call(prompt, system_instruction=_SYSTEM_INSTRUCTION,
+                                       json_mode=True)
+
+    try:
+        # orjson: C-level parse, 2-5x faster on these payloads
+        algorithm_data = orjson.loads(_strip_fences(response))
+    except orjson.JSONDecodeError as e:
+        logger.error("Failed to parse LLM response as JSON: %s", e)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Response was: %s...", response[:500])
+        raise ValueError(f"Failed to generate valid algorithm data: {e}")
+
+    # Ensure algorithm_id is set correctly
+    algorithm_data['algorithm_id'] = algorithm_id
+
+    # Reject structurally invalid output instead of caching it; one
+    # corrective re-prompt before giving up
+    try:
+        _VALIDATE_ALGO(algorithm_data)
+    except fastjsonschema.JsonSchemaException as e:
+        logger.warning("Generated JSON failed schema validation (%s), re-prompting once", e.message)
+        retry_prompt = (f"{prompt}\n\nYour previous output was invalid: {e.message}. "
+                        f"Return ONLY the corrected, complete JSON object.")
+        response = await provider.call(retry_prompt, system_instruction=_SYSTEM_INSTRUCTION,
+                                       json_mode=True, **tier_kwargs)
+        try:
+            algorithm_data = orjson.loads(_strip_fences(response))
+        except orjson.JSONDecodeError as parse_err:
+            logger.error("Retry response failed to parse as JSON: %s", parse_err)
+            raise ValueError(f"Failed to generate valid algorithm data: {parse_err}")
+        algorithm_data['algorithm_id'] = algorithm_id
+        try:
+            _VALIDATE_ALGO(algorithm_data)
+        except fastjsonschema.JsonSchemaException as retry_err:
+            logger.error("Retry output still invalid: %s", retry_err.message)
+            raise ValueError(f"Failed to generate valid algorithm data: {retry_err.message}")
+
+    # Save to cache for future use - fire-and-forget so the caller gets the
+    # response without waiting on the disk write. The in-memory cache is
+    # populated synchronously, so concurrent reads see the data immediately.
+    _spawn_cache_write(algorithm_id, algorithm_data)
+
+    logger.info("Successfully generated algorithm explanation for: %s", algorithm_name)
+    return algorithm_data
 
 
 def normalize_algorithm_id(name: str) -> str:
     """Convert algorithm name to snake_case file ID."""
-    # Convert to lowercase
-    normalized = name.lower()
-    # Replace spaces and special chars with underscores
-    normalized = re.sub(r'[^a-z0-9]+', '_', normalized)
-    # Remove leading/trailing underscores
-    normalized = normalized.strip('_')
+    # Lowercase, replace special chars with underscores, trim the edges
+    normalized = _NORMALIZE_RE.sub('_', name.lower()).strip('_')
     # Remove common suffixes
-    for suffix in ['_approach', '_algorithm', '_technique', '_method', '_optimization']:
+    for suffix in _SUFFIXES:
         if normalized.endswith(suffix) and len(normalized) > len(suffix):
             normalized = normalized[:-len(suffix)]
     return normalized
 
 
-def load_cached_algorithm(algorithm_id: str) -> Optional[dict]:
-    """Try to load algorithm from cache."""
-    cache_path = os.path.join(CACHE_DIR, f"{algorithm_id}.json")
-    if os.path.exists(cache_path):
+async def load_cached_algorithm(algorithm_id: str) -> Optional[dict]:
+    """Try to load algorithm from the in-memory cache, falling back to disk."""
+    cached = _MEM_CACHE.get(algorithm_id)
+    if cached is not None:
+        return cached
+
+    cache_path = CACHE_DIR / f"{algorithm_id}.json"
+    # Async stat - a blocking os.path.exists would serialize concurrent
+    # requests whenever the cache dir sits on slow/network storage
+    if await aio_path.exists(cache_path):
         try:
-            with open(cache_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            async with aiofiles.open(cache_path, 'rb') as f:
+                data = orjson.loads(await f.read())
+            _MEM_CACHE.set(algorithm_id, data)
+            return data
         except Exception as e:
-            logger.warning(f"Failed to load cached algorithm: {e}")
+            logger.warning("Failed to load cached algorithm: %s", e)
     return None
 
 
-def save_to_cache(algorithm_id: str, data: dict) -> bool:
-    """Save generated algorithm to cache."""
+async def save_to_cache(algorithm_id: str, data: dict) -> bool:
+    """Save generated algorithm to cache (memory + disk)."""
+    _MEM_CACHE.set(algorithm_id, data)
     try:
-        os.makedirs(CACHE_DIR, exist_ok=True)
-        cache_path = os.path.join(CACHE_DIR, f"{algorithm_id}.json")
-        with open(cache_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
-        logger.info(f"Saved algorithm to cache: {cache_path}")
+        cache_path = CACHE_DIR / f"{algorithm_id}.json"
+        # Compact serialization: ~30% smaller files than indent=2 and a
+        # single pre-serialized bytes write
+        payload = orjson.dumps(data)
+        async with aiofiles.open(cache_path, 'wb') as f:
+            await f.write(payload)
+        logger.info("Saved algorithm to cache: %s", cache_path)
         return True
     except Exception as e:
-        logger.warning(f"Failed to save to cache: {e}")
+        logger.warning("Failed to save to cache: %s", e)
         return False
 
 
+def _spawn_cache_write(algorithm_id: str, data: dict) -> None:
+    """Persist to the memory cache now and schedule the disk write.
+
+    The disk flush runs as a background task, keeping write latency out of
+    the user-visible response path.
+    """
+    _MEM_CACHE.set(algorithm_id, data)
+    task = asyncio.create_task(save_to_cache(algorithm_id, data))
+    _PENDING_WRITES.add(task)
+    task.add_done_callback(_PENDING_WRITES.discard)
+
+
+async def flush_cache_writes() -> None:
+    """Wait for any in-flight background cache writes (shutdown hook)."""
+    if _PENDING_WRITES:
+        await asyncio.gather(*_PENDING_WRITES, return_exceptions=True)
+
+
 async def generate_algorithm_explanation(algorithm_name: str, problem_context: str = "") -> dict:
     """
     Generate comprehensive algorithm explanation using LLM.
@@ -74,252 +323,111 @@ async def generate_algorithm_explanation(algorithm_name: str, problem_context: s
     algorithm_id = normalize_algorithm_id(algorithm_name)
 
     # Check cache first
-    cached = load_cached_algorithm(algorithm_id)
+    cached = await load_cached_algorithm(algorithm_id)
     if cached:
-        logger.info(f"Using cached algorithm data for: {algorithm_name}")
+        logger.info("Using cached algorithm data for: %s", algorithm_name)
         return cached
 
-    logger.info(f"Generating algorithm explanation via LLM for: {algorithm_name}")
+    logger.info("Generating algorithm explanation via LLM for: %s", algorithm_name)
 
-    # Build the comprehensive prompt
-    prompt = f"""You are an expert computer science educator. Generate a comprehensive, educational explanation for the algorithm: "{algorithm_name}"
+    # Fill the frozen template - one format call instead of rebuilding
+    # the ~4 KB f-string on every cache miss
+    context_line = (
+        f"PROBLEM CONTEXT (use this to make examples relevant): {problem_context}"
+        if problem_context else ""
+    )
+    prompt = _PROMPT_TMPL.format(
+        algorithm_name=algorithm_name,
+        algorithm_id=algorithm_id,
+        context_line=context_line,
+    )
 
-{"PROBLEM CONTEXT (use this to make examples relevant): " + problem_context if problem_context else ""}
+    try:
+        # Route well-known algorithms to the fast tier; they don't need the
+        # pro model to fill in a fixed schema
+        model_tier = "flash" if algorithm_id in _SIMPLE_ALGOS else "pro"
+        logger.info("Model tier for %s: %s", algorithm_id, model_tier)
 
-Return a valid JSON object with this EXACT structure. Be thorough and educational like a textbook explanation.
+        return await _call_and_cache(llm, prompt, algorithm_id, algorithm_name, model_tier=model_tier)
 
-{{
-  "algorithm_id": "{algorithm_id}",
-  "name": "{algorithm_name}",
-  "display_name": "{algorithm_name}",
-  "category": "Category name (e.g., 'Divide and Conquer', 'Dynamic Programming', 'Greedy', 'Graph Traversal', 'Monotonic Stack', etc.)",
-  "tags": ["tag1", "tag2", "tag3", "tag4"],
+    except Exception as e:
+        logger.error("Error generating algorithm explanation: %s", e)
+        raise
 
-  "overview": {{
-    "core_idea": "A clear, concise explanation of what this algorithm does and WHY it works. 2-3 sentences.",
-    "when_to_use": [
-      "Specific condition 1 when this algorithm is ideal",
-      "Specific condition 2",
-      "Specific condition 3",
-      "Specific condition 4"
-    ],
-    "real_world_analogy": "A relatable, memorable analogy that helps understand the algorithm. Like explaining to a smart 12-year-old."
-  }},
 
-  "visual_explanation": {{
-    "steps": [
-      {{
-        "title": "Step 1 title",
-        "description": "What happens in this step and why",
-        "array": [2, 1, 5, 6, 2, 3],
-        "highlight": "init"
-      }},
-      {{
-        "title": "Step 2 title",
-        "description": "Detailed explanation of the operation",
-        "array": [2, 1, 5, 6, 2, 3],
-        "highlight": "process"
-      }}
-    ]
-  }},
+async def generate_algorithm_explanations_batch(algorithm_names: list) -> dict:
+    """
+    Generate explanations for several algorithms in a single LLM call.
 
-  "pseudocode": {{
-    "language": "generic",
-    "code": "function algorithmName(input):\\n    // Line 1: Initialize\\n    variable = initial_value\\n    \\n    // Line 2: Main logic\\n    for each element in input:\\n        process(element)\\n    \\n    return result",
-    "annotations": [
-      {{"line": 1, "text": "Clear explanation of what this line does"}},
-      {{"line": 2, "text": "Explanation of initialization"}},
-      {{"line": 5, "text": "Explain the loop logic"}},
-      {{"line": 6, "text": "Explain processing step"}},
-      {{"line": 8, "text": "Explain return value"}}
-    ],
-    "variables": [
-      {{"name": "variableName", "description": "What this variable stores"}},
-      {{"name": "anotherVar", "description": "Purpose of this variable"}}
-    ],
-    "key_operations": [
-      "First key operation description",
-      "Second key operation description",
-      "Third key operation description"
-    ],
-    "return_values": [
-      {{"value": "result", "condition": "When successful"}},
-      {{"value": "-1 or null", "condition": "When not found/failed"}}
-    ],
-    "flow_steps": [
-      "Initialize",
-      "Process",
-      "Check Condition",
-      "Update State",
-      "Return Result"
-    ]
-  }},
+    Useful for cache warming: one round-trip with a shared prompt prefix
+    replaces N independent requests. Already-cached algorithms are served
+    from cache and skipped in the prompt.
 
-  "complexity": {{
-    "time": {{
-      "best": "O(?)",
-      "average": "O(?)",
-      "worst": "O(?)",
-      "explanation": "Detailed explanation of WHY this is the time complexity. Explain the reasoning.",
-      "comparison_data": [
-        {{"n": 10, "optimized": 10, "bruteforce": 100}},
-        {{"n": 100, "optimized": 100, "bruteforce": 10000}},
-        {{"n": 1000, "optimized": 1000, "bruteforce": 1000000}},
-        {{"n": 10000, "optimized": 10000, "bruteforce": 100000000}}
-      ]
-    }},
-    "space": {{
-      "complexity": "O(?)",
-      "explanation": "Explain what extra space is used and why."
-    }}
-  }},
+    Args:
+        algorithm_names: Algorithm names to generate (e.g., from problem hints)
 
-  "variations": [
-    {{
-      "name": "Variation 1 Name",
-      "description": "How this variation differs from the main algorithm",
-      "use_case": "When to use this variation",
-      "example": {{
-        "input": "Example input",
-        "output": "Expected output"
-      }},
-      "key_change": "What code/logic changes for this variation"
-    }},
-    {{
-      "name": "Variation 2 Name",
-      "description": "Description",
-      "use_case": "Use case",
-      "example": {{
-        "input": "Input",
-        "output": "Output"
-      }},
-      "key_change": "Key modification"
-    }}
-  ],
-
-  "common_pitfalls": [
-    {{
-      "title": "Pitfall 1: Descriptive title",
-      "problem": "What goes wrong and when",
-      "bad_code": "// The incorrect way\\nincorrect_code_here",
-      "good_code": "// The correct way\\ncorrect_code_here",
-      "explanation": "Why the bad code fails and why the fix works"
-    }},
-    {{
-      "title": "Pitfall 2: Another common mistake",
-      "problem": "Description of the issue",
-      "bad_code": "bad_example",
-      "good_code": "good_example",
-      "explanation": "Explanation"
-    }},
-    {{
-      "title": "Pitfall 3: Edge case issue",
-      "problem": "What edge case is missed",
-      "bad_code": "code_missing_edge_case",
-      "good_code": "code_handling_edge_case",
-      "explanation": "Why edge cases matter"
-    }}
-  ],
+    Returns:
+        Dict mapping algorithm_id to explanation data
+    """
+    results = {}
+    pending = []
+    for name in algorithm_names:
+        algorithm_id = normalize_algorithm_id(name)
+        cached = await load_cached_algorithm(algorithm_id)
+        if cached:
+            results[algorithm_id] = cached
+        else:
+            pending.append((algorithm_id, name))
 
-  "practice_exercise": {{
-    "title": "Hands-on Practice: [Descriptive Title]",
-    "description": "Walk through the algorithm step by step on this example.",
-    "array": [3, 1, 4, 1, 5, 9, 2, 6],
-    "target": "relevant target or goal",
-    "steps": [
-      {{
-        "question": "Question about the first step?",
-        "hint": "A helpful hint without giving away the answer",
-        "options": ["Option A", "Option B", "Option C", "Option D"],
-        "correct": 0,
-        "explanation": "Detailed explanation of why this is correct and what happens"
-      }},
-      {{
-        "question": "Question about the next step?",
-        "hint": "Another helpful hint",
-        "options": ["Option A", "Option B", "Option C", "Option D"],
-        "correct": 1,
-        "explanation": "Explanation of this step"
-      }},
-      {{
-        "question": "Question about an important decision point?",
-        "hint": "Think about the algorithm's core logic",
-        "options": ["Option A", "Option B", "Option C", "Option D"],
-        "correct": 2,
-        "explanation": "Explanation"
-      }},
-      {{
-        "question": "Final question about the result?",
-        "hint": "Review what we've done so far",
-        "options": ["Option A", "Option B", "Option C", "Option D"],
-        "correct": 0,
-        "explanation": "Final explanation and summary"
-      }}
-    ]
-  }},
+    if not pending:
+        return results
 
-  "pro_tips": [
-    "Practical tip 1 that helps in coding interviews",
-    "Tip 2 about common optimizations",
-    "Tip 3 about recognizing when to use this algorithm",
-    "Tip 4 about debugging or testing",
-    "Tip 5 about related patterns"
-  ],
-
-  "related_problems": [
-    "Problem Name 1 (LeetCode/Platform number if applicable)",
-    "Problem Name 2",
-    "Problem Name 3",
-    "Problem Name 4",
-    "Problem Name 5"
-  ]
-}}
+    logger.info("Batch-generating %d algorithm explanations in one LLM call", len(pending))
 
-IMPORTANT GUIDELINES:
-1. Make the explanation EDUCATIONAL - assume the learner is seeing this algorithm for the first time
-2. Use CONCRETE examples with actual numbers, not abstract descriptions
-3. The visual_explanation steps should walk through a complete example with actual data
-4. The practice_exercise should be INTERACTIVE - questions that test understanding
-5. Pitfalls should show ACTUAL code examples (bad vs good)
-6. The real_world_analogy should be memorable and accurate
-7. Ensure the JSON is valid - escape quotes properly, use \\n for newlines in code strings
-8. The comparison_data should show realistic operation counts (optimized vs brute force)
+    listing = "\n".join(f'- id: "{aid}", name: "{name}"' for aid, name in pending)
+    prompt = f"""You are an expert computer science educator. Generate comprehensive, educational explanations for EACH of these algorithms:
 
-Return ONLY the JSON object, no markdown code blocks or extra text."""
+{listing}
 
-    try:
-        # Call LLM using the singleton
-        system_instruction = "You are an expert computer science educator specializing in algorithms and data structures."
-        response = await llm.call(prompt, system_instruction=system_instruction, json_mode=True)
-
-        # Clean up response - remove markdown code blocks if present
-        cleaned = response.strip()
-        if cleaned.startswith('```json'):
-            cleaned = cleaned[7:]
-        if cleaned.startswith('```'):
-            cleaned = cleaned[3:]
-        if cleaned.endswith('```'):
-            cleaned = cleaned[:-3]
-        cleaned = cleaned.strip()
-
-        # Parse JSON
-        algorithm_data = json.loads(cleaned)
-
-        # Ensure algorithm_id is set correctly
-        algorithm_data['algorithm_id'] = algorithm_id
+Return a single valid JSON object of the form:
+{{"algos": {{"<id>": {{...explanation...}}, ...}}}}
+
+Each explanation object must contain: algorithm_id, name, display_name, category, tags,
+overview (core_idea, when_to_use, real_world_analogy),
+visual_explanation (steps with array examples), pseudocode (code, annotations, variables),
+complexity (time with best/average/worst and comparison_data, space), variations,
+common_pitfalls, practice_exercise, pro_tips, related_problems.
 
-        # Save to cache for future use
-        save_to_cache(algorithm_id, algorithm_data)
+Be educational and use concrete examples. Return ONLY the JSON object."""
 
-        logger.info(f"Successfully generated algorithm explanation for: {algorithm_name}")
-        return algorithm_data
+    try:
+        response = await llm.call(prompt, system_instruction=_SYSTEM_INSTRUCTION, json_mode=True)
+
+        batch_data = orjson.loads(_strip_fences(response))
+
+        for algorithm_id, name in pending:
+            algorithm_data = batch_data.get('algos', {}).get(algorithm_id)
+            if not algorithm_data:
+                logger.warning("Batch response missing algorithm: %s", algorithm_id)
+                continue
+            algorithm_data['algorithm_id'] = algorithm_id
+            # Same structural gate as the single-item path: a malformed
+            # batch entry must not be persisted where load_cached_algorithm
+            # would serve it forever
+            try:
+                _VALIDATE_ALGO(algorithm_data)
+            except fastjsonschema.JsonSchemaException as e:
+                logger.warning("Batch entry %s failed schema validation (%s); skipping",
+                               algorithm_id, e.message)
+                continue
+            _spawn_cache_write(algorithm_id, algorithm_data)
+            results[algorithm_id] = algorithm_data
+
+        logger.info("Batch generation produced %d explanations", len(results))
+        return results
 
-    except json.JSONDecodeError as e:
-        logger.error(f"Failed to parse LLM response as JSON: {e}")
-        logger.debug(f"Response was: {response[:500]}...")
-        raise ValueError(f"Failed to generate valid algorithm data: {e}")
     except Exception as e:
-        logger.error(f"Error generating algorithm explanation: {e}")
+        logger.error("Batch algorithm generation failed: %s", e)
         raise
 
 
@@ -338,12 +446,12 @@ async def get_algorithm_explanation_with_provider(llm_provider, algorithm_name:
     algorithm_id = normalize_algorithm_id(algorithm_name)
 
     # Check cache first
-    cached = load_cached_algorithm(algorithm_id)
+    cached = await load_cached_algorithm(algorithm_id)
     if cached:
-        logger.info(f"Using cached algorithm data for: {algorithm_name}")
+        logger.info("Using cached algorithm data for: %s", algorithm_name)
         return cached
 
-    logger.info(f"Generating algorithm explanation via LLM for: {algorithm_name}")
+    logger.info("Generating algorithm explanation via LLM for: %s", algorithm_name)
 
     # Build prompt (simplified version)
     prompt = f"""Generate a comprehensive educational explanation for the algorithm: "{algorithm_name}"
@@ -357,30 +465,26 @@ complexity (time with best/average/worst, space), variations, common_pitfalls, p
 Be educational and use concrete examples."""
 
     try:
-        system_instruction = "You are an expert computer science educator specializing in algorithms."
-        response = await llm_provider.call(prompt, system_instruction=system_instruction, json_mode=True)
-
-        cleaned = response.strip()
-        if cleaned.startswith('```json'):
-            cleaned = cleaned[7:]
-        if cleaned.startswith('```'):
-            cleaned = cleaned[3:]
-        if cleaned.endswith('```'):
-            cleaned = cleaned[:-3]
-        cleaned = cleaned.strip()
-
-        algorithm_data = json.loads(cleaned)
-        algorithm_data['algorithm_id'] = algorithm_id
-
-        save_to_cache(algorithm_id, algorithm_data)
-        logger.info(f"Generated algorithm explanation for: {algorithm_name}")
-        return algorithm_data
+        return await _call_and_cache(llm_provider, prompt, algorithm_id, algorithm_name)
 
     except Exception as e:
-        logger.error(f"Error generating algorithm explanation: {e}")
+        logger.error("Error generating algorithm explanation: %s", e)
         raise
 
 
+def _candidate_ids(algorithm_id: str):
+    """Yield possible cache file IDs for an algorithm, best match first."""
+    seen = set()
+    mapped = _MAPPINGS.get(algorithm_id)
+    for pid in (mapped, algorithm_id,
+                algorithm_id.replace('_based', ''),
+                algorithm_id + '_optimization',
+                algorithm_id + '_technique'):
+        if pid and pid not in seen:
+            seen.add(pid)
+            yield pid
+
+
 async def get_algorithm_explanation(algorithm_name: str, problem_context: str = "") -> dict:
     """
     Main entry point - get algorithm explanation from cache or generate.
@@ -394,37 +498,32 @@ async def get_algorithm_explanation(algorithm_name: str, problem_context: str =
     """
     algorithm_id = normalize_algorithm_id(algorithm_name)
 
-    # Try multiple possible cache file names
-    possible_ids = [
-        algorithm_id,
-        algorithm_id.replace('_based', ''),
-        algorithm_id + '_optimization',
-        algorithm_id + '_technique',
-    ]
-
-    # Also try common mappings
-    mappings = {
-        'monotonic_stack': 'stack_based_optimization',
-        'stack': 'stack_based_optimization',
-        'two_pointers': 'two_pointer',
-        'hashmap': 'hash_map',
-        'hash_table': 'hash_map',
-        'binary_search_tree': 'binary_search',
-        'morris_traversal_for_constant_space': 'morris_traversal',
-        'morris_traversal_space_optimized': 'morris_traversal',
-        'optimized_in_order_traversal': 'morris_traversal',
-        'constant_space_traversal': 'morris_traversal',
-    }
-
-    if algorithm_id in mappings:
-        possible_ids.insert(0, mappings[algorithm_id])
-
-    # Try to load from cache
-    for pid in possible_ids:
-        cached = load_cached_algorithm(pid)
+    # Try to load from cache - candidates are generated lazily so the
+    # lookup short-circuits on the first hit
+    for pid in _candidate_ids(algorithm_id):
+        cached = await load_cached_algorithm(pid)
         if cached:
-            logger.info(f"Found cached algorithm data: {pid}")
+            logger.info("Found cached algorithm data: %s", pid)
             return cached
 
-    # Generate new explanation
-    return await generate_algorithm_explanation(algorithm_name, problem_context)
+    # Coalesce concurrent generations: if another request is already
+    # generating this algorithm, await its result instead of duplicating
+    # the LLM call
+    inflight = _INFLIGHT.get(algorithm_id)
+    if inflight is not None:
+        logger.info("Awaiting in-flight generation for: %s", algorithm_id)
+        return await inflight
+
+    fut = asyncio.get_running_loop().create_future()
+    _INFLIGHT[algorithm_id] = fut
+    try:
+        result = await generate_algorithm_explanation(algorithm_name, problem_context)
+        fut.set_result(result)
+        return result
+    except Exception as e:
+        fut.set_exception(e)
+        # Mark the exception as retrieved in case no other request is waiting
+        fut.exception()
+        raise
+    finally:
+        _INFLIGHT.pop(algorithm_id, None)
@@ -3,54 +3,204 @@ Educational Flow Generator Agent
 Generates step-by-step learning journey for DSA problems
 """
 
-import json
-from typing import Dict, Any, List
-from app.utils.llm_provider import LLMProvider
+import asyncio
+import difflib
+import functools
+import os
+import random
+import types
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List
+
+import fastjsonschema
+import orjson
+
 from app.utils.logger import get_logger
+from app.utils.llm_batcher import llm_batcher
+from app.utils.semantic_cache import normalize_text, semantic_cache
 
 logger = get_logger("educational_flow")
 
-llm = LLMProvider()
 
+@functools.lru_cache(maxsize=1)
+def _get_llm():
+    """Deferred access to the shared provider singleton.
 
-async def generate_educational_flow_with_provider(llm_provider, problem_text: str, context_toggles: List[str]) -> Dict[str, Any]:
+    Importing llm_provider pulls in the Gemini and Azure SDKs and probes
+    credentials; loading this module no longer pays that cost for
+    processes that never generate an educational flow.
     """
-    Generate a complete 3-phase educational flow using provided LLM provider.
+    from app.utils.llm_provider import llm
+    return llm
 
-    Args:
-        llm_provider: LLM provider instance (from Pipeline)
-        problem_text: Raw problem statement from user
-        context_toggles: System constraints
-
-    Returns:
-        Complete educational flow with all phases
-    """
-    logger.info("Starting Educational Flow Generation with custom provider...")
 
-    phase1 = await _generate_phase_understand_with_provider(llm_provider, problem_text)
-    phase2 = await _generate_phase_analyze_with_provider(llm_provider, problem_text, phase1)
-    phase3 = await _generate_phase_explore_with_provider(llm_provider, phase1, phase2, context_toggles)
+async def _consume_llm(llm_provider, prompt: str, system_instruction: str, **kwargs) -> str:
+    """Fetch the LLM response, streaming chunks when the provider supports it.
 
+    Streaming starts consuming output while the model is still generating,
+    trimming time-to-last-byte; chunks are list-appended and joined once to
+    avoid quadratic string re-accumulation. Buffered call() is the fallback
+    for providers without a stream API.
+    """
+    stream = getattr(llm_provider, 'stream', None)
+    if stream is not None:
+        chunks = []
+        async for chunk in stream(prompt, system_instruction=system_instruction, json_mode=True, **kwargs):
+            chunks.append(chunk)
+        return ''.join(chunks)
+    # Buffered calls go through the coalescing batcher so simultaneous
+    # submissions dispatch as one windowed gather
+    return await llm_batcher.submit(llm_provider, prompt, system_instruction, json_mode=True, **kwargs)
+
+
+# Transient-fault handling around each LLM round-trip: a request that hits
+# a network blip retries within milliseconds instead of surrendering the
+# whole phase (and its dependents) to the generic fallback.
+_LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+_LLM_RETRIES = 3
+_RETRY_BASE_SECONDS = 0.25
+
+# Concurrency caps per model tier. Without a bound, N simultaneous flows
+# fire 3N provider calls at once and trip rate limits; the semaphores keep
+# in-flight calls near what each tier's quota sustains. Created lazily so
+# each one binds to the loop that actually drives it.
+_LLM_TIER_CONCURRENCY = {
+    "pro": int(os.getenv("LLM_PRO_MAX_CONCURRENCY", "4")),
+    "flash": int(os.getenv("LLM_FLASH_MAX_CONCURRENCY", "20")),
+}
+_LLM_DEFAULT_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+_LLM_SEMAPHORES: dict = {}
+
+
+def _tier_semaphore(model_tier) -> asyncio.Semaphore:
+    """Return the shared semaphore bounding calls for this tier."""
+    sem = _LLM_SEMAPHORES.get(model_tier)
+    if sem is None:
+        limit = _LLM_TIER_CONCURRENCY.get(model_tier, _LLM_DEFAULT_CONCURRENCY)
+        sem = asyncio.Semaphore(limit)
+        _LLM_SEMAPHORES[model_tier] = sem
+    return sem
+
+
+async def _call_with_retry(llm_provider, prompt: str, system_instruction: str, **kwargs) -> str:
+    """Bounded retry with exponential backoff and jitter around _consume_llm.
+
+    Only transient faults (timeouts, connection drops) are retried;
+    anything else - bad credentials, malformed prompts - re-raises
+    immediately so it fails fast instead of after three futile attempts.
+    """
+    sem = _tier_semaphore(kwargs.get("model_tier"))
+    for attempt in range(_LLM_RETRIES):
+        try:
+            async with sem:
+                return await asyncio.wait_for(
+                    _consume_llm(llm_provider, prompt, system_instruction, **kwargs),
+                    timeout=_LLM_TIMEOUT_SECONDS
+                )
+        except (asyncio.TimeoutError, ConnectionError, OSError) as e:
+            if attempt == _LLM_RETRIES - 1:
+                raise
+            delay = _RETRY_BASE_SECONDS * (2 ** attempt) + random.random() * 0.1
+            logger.warning("Transient LLM failure (%s); retrying in %.2fs", e, delay)
+            await asyncio.sleep(delay)
+
+
+def _phase_schema(content_required: list) -> dict:
+    """Structural contract for one phase payload - enough to reject shapes
+    the frontend cannot render, without constraining the teaching content."""
     return {
-        "learning_mode": True,
-        "total_phases": 3,
-        "phases": [phase1, phase2, phase3],
-        "current_phase": 0
+        'type': 'object',
+        'required': ['phase', 'phase_number', 'phase_title', 'content'],
+        'properties': {
+            'content': {'type': 'object', 'required': content_required},
+        },
     }
 
 
-async def _generate_phase_understand_with_provider(llm_provider, problem_text: str) -> Dict[str, Any]:
-    """Phase 1 with custom provider"""
-    logger.info("  Phase 1: Understanding the problem...")
+# Compiled to Python bytecode once at import (fastjsonschema)
+_VALIDATE_PHASE1 = fastjsonschema.compile(_phase_schema(['breakdown', 'key_insights']))
+_VALIDATE_PHASE2 = fastjsonschema.compile(_phase_schema(['data_structure_type']))
+_VALIDATE_PHASE3 = fastjsonschema.compile(_phase_schema(['approaches', 'recommended']))
 
-    system_instruction = """You are an expert DSA teacher helping a student understand a problem.
-Your task: Identify objective, break down input/output, list constraints, provide key insights."""
 
-    prompt = f"""Given this DSA problem:
+async def _call_validated(llm_provider, prompt: str, system_instruction: str, validate, **kwargs) -> Dict[str, Any]:
+    """Call the LLM and schema-validate the parsed response.
 
-{problem_text}
+    When the cheap flash tier was requested and its output fails
+    validation, the call is escalated once to the pro tier before giving
+    up. Validation errors propagate to the caller's fallback handling.
+    """
+    response = await _call_with_retry(llm_provider, prompt, system_instruction, **kwargs)
+    try:
+        # Parse inside the guard: a non-JSON flash response escalates the
+        # same way a schema violation does instead of skipping to fallback
+        result = orjson.loads(response)
+        validate(result)
+    except (orjson.JSONDecodeError, fastjsonschema.JsonSchemaException) as e:
+        if kwargs.get("model_tier") != "flash":
+            raise
+        reason = e.message if isinstance(e, fastjsonschema.JsonSchemaException) else str(e)
+        logger.warning("Flash-tier output failed validation (%s); escalating to pro", reason)
+        kwargs["model_tier"] = "pro"
+        response = await _call_with_retry(llm_provider, prompt, system_instruction, **kwargs)
+        result = orjson.loads(response)
+        validate(result)
+    return result
+
+
+# Fallback payloads are frozen once at import; the error path only merges
+# the two outer dict levels instead of re-allocating the nested literal,
+# which matters during provider outages when every request falls through.
+# Leaf lists/dicts are shared - phases are treated as read-only downstream.
+_PHASE1_FALLBACK = types.MappingProxyType({
+    "phase": "understand_problem", "phase_number": 1, "phase_title": "Understanding the Problem",
+    "content": types.MappingProxyType({
+        "problem_statement": "",
+        "breakdown": {"objective": "Solve the given problem", "input": "See problem", "output": "See problem", "constraints": []},
+        "key_insights": ["Analyzing..."]}),
+})
+
+_PHASE2_FALLBACK = types.MappingProxyType({
+    "phase": "analyze_input", "phase_number": 2, "phase_title": "Analyzing Input Structure",
+    "content": types.MappingProxyType({
+        "data_structure_type": "array",
+        "sample_input": {"visual_type": "array", "values": [], "display_format": "horizontal"},
+        "properties": ["Analyzing..."], "why_properties_matter": ["Understanding input is crucial"]}),
+})
+
+_PHASE3_FALLBACK = types.MappingProxyType({
+    "phase": "explore_approaches", "phase_number": 3, "phase_title": "Exploring Possible Approaches",
+    "content": types.MappingProxyType({
+        "approaches": [{"name": "Standard Approach", "description": "Common solution", "complexity": {"time": "O(n)", "space": "O(n)"}, "meets_constraints": True, "pros": ["Efficient"], "cons": [], "suitable_for": "Most cases"}],
+        "recommended": {"approach_name": "Standard Approach", "reason": "Balanced complexity", "key_insight": "We'll explore together"}}),
+})
+
+
+def _phase1_fallback(problem_text: str) -> Dict[str, Any]:
+    """Deterministic phase-1 skeleton, used on LLM failure and as the
+    seed for speculative phase-2 generation."""
+    return {**_PHASE1_FALLBACK,
+            "content": {**_PHASE1_FALLBACK["content"], "problem_statement": problem_text}}
+
+
+def _phase2_fallback() -> Dict[str, Any]:
+    """Deterministic phase-2 skeleton returned on LLM failure."""
+    return {**_PHASE2_FALLBACK, "content": {**_PHASE2_FALLBACK["content"]}}
+
+
+def _phase3_fallback() -> Dict[str, Any]:
+    """Deterministic phase-3 skeleton returned on LLM failure."""
+    return {**_PHASE3_FALLBACK, "content": {**_PHASE3_FALLBACK["content"]}}
+
+
+# Prompt scaffolding is frozen once at import; each call interpolates only
+# the short variable footer via format_map instead of re-building the
+# multi-KB invariant text.
+_PHASE1_SYSTEM = """You are an expert DSA teacher helping a student understand a problem.
+Your task: Identify objective, break down input/output, list constraints, provide key insights."""
 
-Generate a JSON response that helps a learner UNDERSTAND the problem:
+_PHASE1_PROMPT_TMPL = """Generate a JSON response that helps a learner UNDERSTAND the DSA problem given at the END of this message:
 
 {{
   "phase": "understand_problem",
@@ -66,27 +216,16 @@ Generate a JSON response that helps a learner UNDERSTAND the problem:
     }},
     "key_insights": ["Insight 1", "Insight 2"]
   }}
-}}"""
-
-    try:
-        response = await llm_provider.call(prompt, system_instruction, json_mode=True)
-        return json.loads(response)
-    except Exception as e:
-        logger.error(f"Error in Phase 1: {e}")
-        return {"phase": "understand_problem", "phase_number": 1, "phase_title": "Understanding the Problem",
-                "content": {"problem_statement": problem_text, "breakdown": {"objective": "Solve the given problem", "input": "See problem", "output": "See problem", "constraints": []}, "key_insights": ["Analyzing..."]}}
+}}
 
+The problem:
 
-async def _generate_phase_analyze_with_provider(llm_provider, problem_text: str, phase1: Dict[str, Any]) -> Dict[str, Any]:
-    """Phase 2 with custom provider"""
-    logger.info("  Phase 2: Analyzing input structure...")
+{problem_text}"""
 
-    system_instruction = """You are an expert DSA teacher analyzing input structure.
+_PHASE2_SYSTEM = """You are an expert DSA teacher analyzing input structure.
 Identify data structure type, extract sample values, identify key properties."""
 
-    prompt = f"""Given: {json.dumps(phase1, indent=2)}
-
-Generate JSON for input analysis:
+_PHASE2_PROMPT_TMPL = """Generate JSON for input analysis of the problem understanding given at the END of this message:
 {{
   "phase": "analyze_input",
   "phase_number": 2,
@@ -97,33 +236,14 @@ Generate JSON for input analysis:
     "properties": ["Property 1", "Property 2"],
     "why_properties_matter": ["Why 1 matters", "Why 2 matters"]
   }}
-}}"""
-
-    try:
-        response = await llm_provider.call(prompt, system_instruction, json_mode=True)
-        return json.loads(response)
-    except Exception as e:
-        logger.error(f"Error in Phase 2: {e}")
-        return {"phase": "analyze_input", "phase_number": 2, "phase_title": "Analyzing Input Structure",
-                "content": {"data_structure_type": "array", "sample_input": {"visual_type": "array", "values": [], "display_format": "horizontal"},
-                           "properties": ["Analyzing..."], "why_properties_matter": ["Understanding input is crucial"]}}
-
+}}
 
-async def _generate_phase_explore_with_provider(llm_provider, phase1: Dict[str, Any], phase2: Dict[str, Any], context_toggles: List[str]) -> Dict[str, Any]:
-    """Phase 3 with custom provider"""
-    logger.info("  Phase 3: Exploring possible approaches...")
+Given: {phase1_json}"""
 
-    system_instruction = """You are an expert DSA teacher exploring algorithmic approaches.
+_PHASE3_SYSTEM = """You are an expert DSA teacher exploring algorithmic approaches.
 Suggest 2-3 algorithms with pros/cons and recommend the best."""
 
-    constraints_text = ", ".join(context_toggles) if context_toggles else "None"
-
-    prompt = f"""Given:
-- Problem: {json.dumps(phase1.get('content', {}).get('breakdown', {}), indent=2)}
-- Input: {json.dumps(phase2.get('content', {}), indent=2)}
-- Constraints: {constraints_text}
-
-Generate JSON with approaches:
+_PHASE3_PROMPT_TMPL = """Generate JSON with approaches for the problem context given at the END of this message:
 {{
   "phase": "explore_approaches",
   "phase_number": 3,
@@ -134,36 +254,115 @@ Generate JSON with approaches:
     ],
     "recommended": {{"approach_name": "Best Approach", "reason": "Why", "key_insight": "Key insight"}}
   }}
-}}"""
+}}
+
+Given:
+- Problem: {breakdown_json}
+- Input: {input_json}
+- Constraints: {constraints_text}"""
 
+
+# Canonical-problem short circuit: classic problems ("Two Sum", "Valid
+# Parentheses", ...) have static, well-known phase 1/2 content, so a match
+# skips those two LLM round-trips and only phase 3 hits the provider.
+_CANONICAL_PATH = Path(__file__).resolve().parent.parent / "data" / "canonical_problems.json"
+_CANONICAL_MATCH_CUTOFF = 0.88
+
+
+@functools.lru_cache(maxsize=1)
+def _canonical_problems() -> Dict[str, Any]:
+    """Load the precomputed phase-1/2 payloads, keyed by normalized title."""
     try:
-        response = await llm_provider.call(prompt, system_instruction, json_mode=True)
-        return json.loads(response)
-    except Exception as e:
-        logger.error(f"Error in Phase 3: {e}")
-        return {"phase": "explore_approaches", "phase_number": 3, "phase_title": "Exploring Possible Approaches",
-                "content": {"approaches": [{"name": "Standard Approach", "description": "Common solution", "complexity": {"time": "O(n)", "space": "O(n)"}, "meets_constraints": True, "pros": ["Efficient"], "cons": [], "suitable_for": "Most cases"}],
-                           "recommended": {"approach_name": "Standard Approach", "reason": "Balanced complexity", "key_insight": "We'll explore together"}}}
+        with open(_CANONICAL_PATH, "rb") as f:
+            return orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError) as e:
+        logger.warning("Could not load canonical problems: %s", e)
+        return {}
+
+
+def _match_canonical(problem_text: str):
+    """Return (title, entry) for a canonical problem match, or None.
+
+    A pasted LeetCode problem leads with its title, so the match is
+    anchored to the normalized first line: an exact title lookup first,
+    then a fuzzy comparison for slightly misspelled titles. Substring
+    containment is deliberately avoided - a statement that merely
+    mentions "binary search", or a variant title like "Two Sum II",
+    must not inherit the canonical problem's precomputed phases.
+    """
+    problems = _canonical_problems()
+    if not problems:
+        return None
 
+    lines = problem_text.strip().splitlines()
+    if not lines:
+        return None
+    first_line = normalize_text(lines[0])[:80]
 
-async def generate_educational_flow(problem_text: str, context_toggles: List[str]) -> Dict[str, Any]:
+    entry = problems.get(first_line)
+    if entry is not None:
+        return first_line, entry
+
+    close = difflib.get_close_matches(first_line, problems.keys(), n=1,
+                                      cutoff=_CANONICAL_MATCH_CUTOFF)
+    if close:
+        return close[0], problems[close[0]]
+    return None
+
+
+def _canonical_phases(problem_text: str, entry: Dict[str, Any]):
+    """Copy a canonical entry's phases, keeping the user's own statement."""
+    p1, p2 = entry["phase1"], entry["phase2"]
+    phase1 = {**p1, "content": {**p1["content"], "problem_statement": problem_text}}
+    phase2 = {**p2, "content": {**p2["content"]}}
+    return phase1, phase2
+
+
+async def generate_educational_flow_with_provider(llm_provider, problem_text: str, context_toggles: List[str]) -> Dict[str, Any]:
     """
-    Generate a complete 7-phase educational flow for a DSA problem
+    Generate a complete 3-phase educational flow using provided LLM provider.
 
     Args:
+        llm_provider: LLM provider instance (from Pipeline)
         problem_text: Raw problem statement from user
-        context_toggles: System constraints (embedded, high_throughput, etc.)
+        context_toggles: System constraints
 
     Returns:
         Complete educational flow with all phases
     """
+    logger.info("Starting Educational Flow Generation with custom provider...")
 
-    print("🎓 Starting Educational Flow Generation...")
+    canonical = _match_canonical(problem_text)
+    if canonical:
+        title, entry = canonical
+        logger.info("Canonical problem match (%s); skipping phase 1-2 LLM calls", title)
+        phase1, phase2 = _canonical_phases(problem_text, entry)
+        phase3 = await _generate_phase_explore_with_provider(llm_provider, phase1, phase2, context_toggles)
+        return {
+            "learning_mode": True,
+            "total_phases": 3,
+            "phases": [phase1, phase2, phase3],
+            "current_phase": 0
+        }
 
-    # Generate all phases
-    phase1 = await generate_phase_understand(problem_text)
-    phase2 = await generate_phase_analyze(problem_text, phase1)
-    phase3 = await generate_phase_explore(phase1, phase2, context_toggles)
+    # Phase 2 keys off the problem content, which the deterministic phase-1
+    # skeleton already carries in full, so run it speculatively in parallel
+    # with the real phase 1 instead of serializing two LLM round-trips.
+    skeleton = _phase1_fallback(problem_text)
+    phase1, phase2 = await asyncio.gather(
+        _generate_phase_understand_with_provider(llm_provider, problem_text),
+        _generate_phase_analyze_with_provider(llm_provider, problem_text, skeleton)
+    )
+
+    # Only discard the speculative result if it fell back while the real
+    # phase 1 succeeded - then a re-issue with the richer phase-1 content
+    # has a genuine chance of doing better.
+    if phase2 == _phase2_fallback() and phase1 != skeleton:
+        logger.info("Speculative phase 2 fell back; re-issuing with real phase 1")
+        phase2 = await _generate_phase_analyze_with_provider(llm_provider, problem_text, phase1)
+
+    # Phase 3 reads phase 1's breakdown directly, so it stays sequenced
+    phase3 = await _generate_phase_explore_with_provider(llm_provider, phase1, phase2, context_toggles)
 
     return {
         "learning_mode": True,
@@ -173,264 +372,185 @@ async def generate_educational_flow(problem_text: str, context_toggles: List[str
     }
 
 
-async def generate_phase_understand(problem_text: str) -> Dict[str, Any]:
+async def stream_educational_flow_with_provider(llm_provider, problem_text: str,
+                                                context_toggles: List[str]) -> AsyncIterator[Dict[str, Any]]:
     """
-    PHASE 1: Understand the Problem
-    Help learner break down and understand what's being asked
+    Yield each phase of the educational flow as soon as it resolves.
+
+    Same phase logic and speculation as generate_educational_flow_with_provider,
+    but callers (the SSE endpoint) can show phase 1 after a single LLM
+    round-trip instead of waiting for all three.
+
+    Yields:
+        {"phase": <1|2|3>, "data": <phase dict>} per completed phase
     """
+    logger.info("Streaming Educational Flow Generation with custom provider...")
+
+    canonical = _match_canonical(problem_text)
+    if canonical:
+        title, entry = canonical
+        logger.info("Canonical problem match (%s); skipping phase 1-2 LLM calls", title)
+        phase1, phase2 = _canonical_phases(problem_text, entry)
+        yield {"phase": 1, "data": phase1}
+        yield {"phase": 2, "data": phase2}
+        phase3 = await _generate_phase_explore_with_provider(llm_provider, phase1, phase2, context_toggles)
+        yield {"phase": 3, "data": phase3}
+        return
+
+    skeleton = _phase1_fallback(problem_text)
+    phase1_task = asyncio.create_task(
+        _generate_phase_understand_with_provider(llm_provider, problem_text))
+    phase2_task = asyncio.create_task(
+        _generate_phase_analyze_with_provider(llm_provider, problem_text, skeleton))
+
+    phase1 = await phase1_task
+    yield {"phase": 1, "data": phase1}
+
+    phase2 = await phase2_task
+    if phase2 == _phase2_fallback() and phase1 != skeleton:
+        logger.info("Speculative phase 2 fell back; re-issuing with real phase 1")
+        phase2 = await _generate_phase_analyze_with_provider(llm_provider, problem_text, phase1)
+    yield {"phase": 2, "data": phase2}
 
-    print("  📋 Phase 1: Understanding the problem...")
+    phase3 = await _generate_phase_explore_with_provider(llm_provider, phase1, phase2, context_toggles)
+    yield {"phase": 3, "data": phase3}
 
-    system_instruction = """
-You are an expert DSA teacher helping a student understand a problem.
 
-Your task:
-1. Identify the objective (what are we trying to solve?)
-2. Break down the input structure
-3. Break down the output structure
-4. List all constraints (time, space, system)
-5. Provide 2-3 key insights that help understand the problem
+@dataclass(frozen=True)
+class PhaseSpec:
+    """Everything that distinguishes one phase: cache namespace, log line,
+    system prompt, prompt template, and compiled schema validator."""
+    namespace: str
+    log_line: str
+    system: str
+    template: str
+    validate: Callable
 
-Be clear, encouraging, and educational.
-"""
 
-    prompt = f"""
-Given this DSA problem:
+PHASE_SPECS = {
+    1: PhaseSpec("phase1", "  Phase 1: Understanding the problem...",
+                 _PHASE1_SYSTEM, _PHASE1_PROMPT_TMPL, _VALIDATE_PHASE1),
+    2: PhaseSpec("phase2", "  Phase 2: Analyzing input structure...",
+                 _PHASE2_SYSTEM, _PHASE2_PROMPT_TMPL, _VALIDATE_PHASE2),
+    3: PhaseSpec("phase3", "  Phase 3: Exploring possible approaches...",
+                 _PHASE3_SYSTEM, _PHASE3_PROMPT_TMPL, _VALIDATE_PHASE3),
+}
 
-{problem_text}
 
-Generate a JSON response that helps a learner UNDERSTAND the problem:
+async def _run_phase(spec: PhaseSpec, llm_provider, cache_text: str,
+                     format_args: Dict[str, str], fallback: Callable, **llm_kwargs) -> Dict[str, Any]:
+    """Single implementation behind every phase function.
 
-{{
-  "phase": "understand_problem",
-  "phase_number": 1,
-  "phase_title": "Understanding the Problem",
-  "content": {{
-    "problem_statement": "The original problem text",
-    "breakdown": {{
-      "objective": "Clear statement of what we're solving",
-      "input": "Description of input data",
-      "output": "Description of expected output",
-      "constraints": ["List of constraints"]
-    }},
-    "key_insights": [
-      "Insight 1 about the problem",
-      "Insight 2 about the problem"
-    ]
-  }}
-}}
+    Handles the semantic-cache lookup, prompt rendering, validated LLM
+    call, cache insert, and fallback on failure. The per-phase wrappers
+    only supply the spec, cache key, template arguments, and fallback.
+    """
+    cached = semantic_cache.get(spec.namespace, cache_text)
+    if cached is not None:
+        return cached
 
-Remember: Be educational and clear. This is for a learner!
-"""
+    logger.info(spec.log_line)
+    prompt = spec.template.format_map(format_args)
 
     try:
-        response = await llm.call(prompt, system_instruction, json_mode=True, model_tier="pro")
-        result = json.loads(response)
+        result = await _call_validated(llm_provider, prompt, spec.system, spec.validate, **llm_kwargs)
+        semantic_cache.set(spec.namespace, cache_text, result)
         return result
     except Exception as e:
-        print(f"  ❌ Error in Phase 1: {e}")
-        # Return fallback
-        return {
-            "phase": "understand_problem",
-            "phase_number": 1,
-            "phase_title": "Understanding the Problem",
-            "content": {
-                "problem_statement": problem_text,
-                "breakdown": {
-                    "objective": "Solve the given problem",
-                    "input": "See problem statement",
-                    "output": "See problem statement",
-                    "constraints": []
-                },
-                "key_insights": [
-                    "Let's analyze this step by step",
-                    "We'll explore different approaches"
-                ]
-            }
-        }
+        logger.error("Error in %s: %s", spec.namespace, e)
+        return fallback()
 
 
-async def generate_phase_analyze(problem_text: str, phase1: Dict[str, Any]) -> Dict[str, Any]:
-    """
-    PHASE 2: Analyze Input Structure
-    Help learner understand the data structures involved
-    """
+def _phase3_cache_text(phase1: Dict[str, Any], context_toggles: List[str]) -> str:
+    # Phase 3 never sees the raw problem text - key on the statement
+    # carried in phase 1 plus the constraint toggles
+    return f"{phase1.get('content', {}).get('problem_statement', '')}|{','.join(context_toggles or [])}"
 
-    print("  🔍 Phase 2: Analyzing input structure...")
 
-    system_instruction = """
-You are an expert DSA teacher helping a student analyze the input structure.
+def _phase3_format_args(phase1: Dict[str, Any], phase2: Dict[str, Any], context_toggles: List[str]) -> Dict[str, str]:
+    return {
+        "breakdown_json": orjson.dumps(phase1.get('content', {}).get('breakdown', {})).decode(),
+        "input_json": orjson.dumps(phase2.get('content', {})).decode(),
+        "constraints_text": ", ".join(context_toggles) if context_toggles else "None",
+    }
 
-Your task:
-1. Identify the data structure type (array, linked list, tree, graph, string, etc.)
-2. Extract actual values if provided in the problem
-3. Identify key properties of the input
-4. Explain why these properties matter
 
-Be visual and concrete. Use examples.
-"""
+async def _generate_phase_understand_with_provider(llm_provider, problem_text: str) -> Dict[str, Any]:
+    """Phase 1 with custom provider"""
+    return await _run_phase(PHASE_SPECS[1], llm_provider, problem_text,
+                            {"problem_text": problem_text},
+                            lambda: _phase1_fallback(problem_text))
 
-    prompt = f"""
-Given this problem understanding:
 
-{json.dumps(phase1, indent=2)}
+async def _generate_phase_analyze_with_provider(llm_provider, problem_text: str, phase1: Dict[str, Any]) -> Dict[str, Any]:
+    """Phase 2 with custom provider"""
+    return await _run_phase(PHASE_SPECS[2], llm_provider, problem_text,
+                            {"phase1_json": orjson.dumps(phase1).decode()},
+                            _phase2_fallback)
 
-Generate a JSON response that helps a learner ANALYZE the input:
 
-{{
-  "phase": "analyze_input",
-  "phase_number": 2,
-  "phase_title": "Analyzing Input Structure",
-  "content": {{
-    "data_structure_type": "array|tree|graph|string|linked_list|etc",
-    "sample_input": {{
-      "visual_type": "array|tree|etc",
-      "values": [actual values if available],
-      "display_format": "how to display it"
-    }},
-    "properties": [
-      "Property 1: Length is 8",
-      "Property 2: Values range from 1-8",
-      "Property 3: Some duplicates exist"
-    ],
-    "why_properties_matter": [
-      "Why property 1 is important",
-      "Why property 2 is important"
-    ]
-  }}
-}}
+async def _generate_phase_explore_with_provider(llm_provider, phase1: Dict[str, Any], phase2: Dict[str, Any], context_toggles: List[str]) -> Dict[str, Any]:
+    """Phase 3 with custom provider"""
+    return await _run_phase(PHASE_SPECS[3], llm_provider, _phase3_cache_text(phase1, context_toggles),
+                            _phase3_format_args(phase1, phase2, context_toggles),
+                            _phase3_fallback)
 
-If the problem contains explicit input values like [1,2,3] or a tree diagram, extract them!
-"""
 
-    try:
-        response = await llm.call(prompt, system_instruction, json_mode=True, model_tier="pro")
-        result = json.loads(response)
-        return result
-    except Exception as e:
-        print(f"  ❌ Error in Phase 2: {e}")
-        return {
-            "phase": "analyze_input",
-            "phase_number": 2,
-            "phase_title": "Analyzing Input Structure",
-            "content": {
-                "data_structure_type": "array",
-                "sample_input": {
-                    "visual_type": "array",
-                    "values": [],
-                    "display_format": "horizontal"
-                },
-                "properties": ["Analyzing input structure..."],
-                "why_properties_matter": ["Understanding input is crucial for choosing the right algorithm"]
-            }
-        }
+async def generate_educational_flow(problem_text: str, context_toggles: List[str]) -> Dict[str, Any]:
+    """
+    Generate a complete 3-phase educational flow for a DSA problem
 
+    Args:
+        problem_text: Raw problem statement from user
+        context_toggles: System constraints (embedded, high_throughput, etc.)
 
-async def generate_phase_explore(phase1: Dict[str, Any], phase2: Dict[str, Any], context_toggles: List[str]) -> Dict[str, Any]:
-    """
-    PHASE 3: Explore Possible Approaches
-    Show 2-3 different algorithms with pros/cons
+    Returns:
+        Complete educational flow with all phases
     """
 
-    print("  💭 Phase 3: Exploring possible approaches...")
-
-    system_instruction = """
-You are an expert DSA teacher helping a student explore different algorithmic approaches.
+    logger.info("Starting Educational Flow Generation...")
 
-Your task:
-1. Suggest 2-3 different algorithms to solve the problem
-2. For each approach, provide:
-   - Clear name
-   - Time complexity
-   - Space complexity
-   - Whether it meets constraints
-   - Pros and cons
-3. Recommend the BEST approach and explain why
+    # Generate all phases
+    phase1 = await generate_phase_understand(problem_text)
+    phase2 = await generate_phase_analyze(problem_text, phase1)
+    phase3 = await generate_phase_explore(phase1, phase2, context_toggles)
 
-Consider the system constraints provided.
-"""
+    return {
+        "learning_mode": True,
+        "total_phases": 3,
+        "phases": [phase1, phase2, phase3],
+        "current_phase": 0
+    }
 
-    constraints_text = ", ".join(context_toggles) if context_toggles else "None"
 
-    prompt = f"""
-Given:
-- Problem understanding: {json.dumps(phase1.get('content', {}).get('breakdown', {}), indent=2)}
-- Input analysis: {json.dumps(phase2.get('content', {}), indent=2)}
-- System constraints: {constraints_text}
+async def generate_phase_understand(problem_text: str) -> Dict[str, Any]:
+    """
+    PHASE 1: Understand the Problem
+    Help learner break down and understand what's being asked
+    """
+    return await _run_phase(PHASE_SPECS[1], _get_llm(), problem_text,
+                            {"problem_text": problem_text},
+                            lambda: _phase1_fallback(problem_text), model_tier="flash")
 
-Generate a JSON response with 2-3 algorithmic approaches:
 
-{{
-  "phase": "explore_approaches",
-  "phase_number": 3,
-  "phase_title": "Exploring Possible Approaches",
-  "content": {{
-    "approaches": [
-      {{
-        "name": "Brute Force",
-        "description": "Simple but slow approach",
-        "complexity": {{
-          "time": "O(n²)",
-          "space": "O(1)"
-        }},
-        "meets_constraints": false,
-        "pros": ["Easy to understand", "No extra space"],
-        "cons": ["Too slow for large inputs"],
-        "suitable_for": "Small datasets or learning"
-      }},
-      {{
-        "name": "Optimized Approach",
-        "description": "Better algorithm using X technique",
-        "complexity": {{
-          "time": "O(n)",
-          "space": "O(1)"
-        }},
-        "meets_constraints": true,
-        "pros": ["Fast", "Space efficient"],
-        "cons": ["Slightly complex"],
-        "suitable_for": "Production use"
-      }}
-    ],
-    "recommended": {{
-      "approach_name": "Optimized Approach",
-      "reason": "Meets all constraints and has optimal complexity",
-      "key_insight": "The key insight that makes this work"
-    }}
-  }}
-}}
+async def generate_phase_analyze(problem_text: str, phase1: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    PHASE 2: Analyze Input Structure
+    Help learner understand the data structures involved
+    """
+    return await _run_phase(PHASE_SPECS[2], _get_llm(), problem_text,
+                            {"phase1_json": orjson.dumps(phase1).decode()},
+                            _phase2_fallback, model_tier="flash")
 
-Provide real, practical approaches. If constraints include "low_memory", recommend space-efficient algorithms.
-"""
 
-    try:
-        response = await llm.call(prompt, system_instruction, json_mode=True, model_tier="pro")
-        result = json.loads(response)
-        return result
-    except Exception as e:
-        print(f"  ❌ Error in Phase 3: {e}")
-        return {
-            "phase": "explore_approaches",
-            "phase_number": 3,
-            "phase_title": "Exploring Possible Approaches",
-            "content": {
-                "approaches": [
-                    {
-                        "name": "Standard Approach",
-                        "description": "Common solution to this problem",
-                        "complexity": {"time": "O(n)", "space": "O(n)"},
-                        "meets_constraints": True,
-                        "pros": ["Efficient", "Well-known pattern"],
-                        "cons": ["Requires understanding of data structures"],
-                        "suitable_for": "Most cases"
-                    }
-                ],
-                "recommended": {
-                    "approach_name": "Standard Approach",
-                    "reason": "Balanced time and space complexity",
-                    "key_insight": "We'll explore this together"
-                }
-            }
-        }
+async def generate_phase_explore(phase1: Dict[str, Any], phase2: Dict[str, Any], context_toggles: List[str]) -> Dict[str, Any]:
+    """
+    PHASE 3: Explore Possible Approaches
+    Show 2-3 different algorithms with pros/cons
+    """
+    return await _run_phase(PHASE_SPECS[3], _get_llm(), _phase3_cache_text(phase1, context_toggles),
+                            _phase3_format_args(phase1, phase2, context_toggles),
+                            _phase3_fallback, model_tier="flash")
 
 
 # Future phases (designed for interactive learning):
@@ -1,56 +1,43 @@
 
-import json
-from app.utils.llm_provider import llm
+import orjson
+
 from app.utils.logger import get_logger, log_error_with_context
 
 logger = get_logger("instrumenter")
 
 
-async def run_instrumenter_with_provider(llm_provider, blueprint: dict, normalized_data: dict) -> dict:
-    """
-    Generate instrumented Python code using provided LLM provider.
+# Frozen at import: the instrumentation instructions are invariant, so each
+# request only interpolates the strategy and example footer via format_map.
+_INSTRUMENTER_SYSTEM = """You are a Lead Python Developer specializing in algorithm instrumentation for educational visualizations.
+    Create code that logs MEANINGFUL ALGORITHMIC STEPS, not individual variable updates."""
 
-    Args:
-        llm_provider: LLM provider instance (from Pipeline)
-        blueprint: Output from strategist agent
-        normalized_data: Output from normalizer (includes example inputs)
+_EXAMPLE_SECTION_TMPL = """
+    CRITICAL: USE THESE EXACT INPUT VALUES IN run_demo()
+    Input Variables: {input_vars_json}
+    Expected Output: {expected_output}
 
-    Returns:
-        Dictionary with generated code and entry point
+    Your run_demo() function MUST use these exact values, NOT made-up examples!
     """
-    strategy = blueprint.get('selected_strategy_for_instrumentation', 'Unknown')
-    example_inputs = normalized_data.get('example_inputs', [])
-
-    logger.info(f"Generating instrumented code for: {strategy}")
-    if example_inputs:
-        logger.info(f"Using example inputs: {example_inputs[0].get('input_vars', {})}")
 
-    # Build example inputs section
-    example_section = ""
-    if example_inputs and len(example_inputs) > 0:
-        first_example = example_inputs[0]
-        input_vars = first_example.get('input_vars', {})
-        expected_output = first_example.get('expected_output', 'Unknown')
-
-        example_section = f"""
-    CRITICAL: USE THESE EXACT INPUT VALUES IN run_demo()
-    Input Variables: {json.dumps(input_vars)}
-    Expected Output: {expected_output}
+_EXAMPLE_SECTION_FULL_TMPL = """
+    ╔══════════════════════════════════════════════════════════════════╗
+    ║  CRITICAL: USE THESE EXACT INPUT VALUES IN run_demo()            ║
+    ╠══════════════════════════════════════════════════════════════════╣
+    ║  Input Variables: {input_vars_json}
+    ║  Expected Output: {expected_output}
+    ╚══════════════════════════════════════════════════════════════════╝
 
     Your run_demo() function MUST use these exact values, NOT made-up examples!
+    For example, if input_vars shows {{"s": "babad"}}, your run_demo() should have:
+        test_input = "babad"  # From problem example
     """
-    else:
-        example_section = """
+
+_NO_EXAMPLE_SECTION = """
     No specific example inputs provided. Create reasonable test data for the algorithm.
     """
 
-    system_instruction = """You are a Lead Python Developer specializing in algorithm instrumentation for educational visualizations.
-    Create code that logs MEANINGFUL ALGORITHMIC STEPS, not individual variable updates."""
-
-    prompt = f"""
-    Implement this algorithm: {strategy}
-
-    {example_section}
+_INSTRUMENTER_PROMPT_TMPL = """
+    Implement the algorithm named at the END of this message.
 
     INSTRUMENTATION REQUIREMENTS:
 
@@ -92,77 +79,14 @@ async def run_instrumenter_with_provider(llm_provider, blueprint: dict, normaliz
         "entry_point": "run_demo",
         "complexity_analysis": "Time and space complexity explanation"
     }}
-    """
-
-    try:
-        logger.debug("Calling LLM for code generation...")
-        response_text = await llm_provider.call(prompt, system_instruction=system_instruction, json_mode=True)
 
-        code_data = json.loads(response_text)
-
-        entry_point = code_data.get('entry_point', 'Unknown')
-        code_length = len(code_data.get('code', ''))
-
-        logger.info(f"Code generated: {code_length} characters")
-        logger.info(f"Entry point: {entry_point}")
-        logger.debug(f"Code preview:\n{code_data.get('code', '')[:300]}...")
-
-        return code_data
-
-    except Exception as e:
-        log_error_with_context(logger, e, {"strategy": strategy})
-        raise
-
-
-async def run_instrumenter(blueprint: dict, normalized_data: dict) -> dict:
-    """
-    Generate instrumented Python code for the selected algorithm
-
-    Args:
-        blueprint: Output from strategist agent
-        normalized_data: Output from normalizer (includes example inputs)
-
-    Returns:
-        Dictionary with generated code and entry point
-    """
-    strategy = blueprint.get('selected_strategy_for_instrumentation', 'Unknown')
-    example_inputs = normalized_data.get('example_inputs', [])
-
-    logger.info(f"Generating instrumented code for: {strategy}")
-    if example_inputs:
-        logger.info(f"Using example inputs: {example_inputs[0].get('input_vars', {})}")
-
-    # Build example inputs section
-    example_section = ""
-    if example_inputs and len(example_inputs) > 0:
-        first_example = example_inputs[0]
-        input_vars = first_example.get('input_vars', {})
-        expected_output = first_example.get('expected_output', 'Unknown')
-
-        example_section = f"""
-    ╔══════════════════════════════════════════════════════════════════╗
-    ║  CRITICAL: USE THESE EXACT INPUT VALUES IN run_demo()            ║
-    ╠══════════════════════════════════════════════════════════════════╣
-    ║  Input Variables: {json.dumps(input_vars)}
-    ║  Expected Output: {expected_output}
-    ╚══════════════════════════════════════════════════════════════════╝
+    Algorithm to implement: {strategy}
 
-    Your run_demo() function MUST use these exact values, NOT made-up examples!
-    For example, if input_vars shows {{"s": "babad"}}, your run_demo() should have:
-        test_input = "babad"  # From problem example
-    """
-    else:
-        example_section = """
-    No specific example inputs provided. Create reasonable test data for the algorithm.
+    {example_section}
     """
 
-    system_instruction = """You are a Lead Python Developer specializing in algorithm instrumentation for educational visualizations.
-    Create code that logs MEANINGFUL ALGORITHMIC STEPS, not individual variable updates."""
-
-    prompt = f"""
-    Implement this algorithm: {strategy}
-
-    {example_section}
+_INSTRUMENTER_PROMPT_FULL_TMPL = """
+    Implement the algorithm named at the END of this message.
 
     INSTRUMENTATION REQUIREMENTS:
 
@@ -182,68 +106,7 @@ async def run_instrumenter(blueprint: dict, normalized_data: dict) -> dict:
 
        **Examples by Data Structure:**
 
-       **Linked List Problems:**
-       ```python
-       def run_demo(self):
-           class ListNode:
-               def __init__(self, val=0, next=None):
-                   self.val = val
-                   self.next = next
-
-           # Build test list from problem example
-           head = ListNode(1, ListNode(2, ListNode(3, ListNode(4, ListNode(5)))))
-           k = 2  # Extract k value from problem description
-
-           result = self.reverseKGroup(head, k)
-           return result
-       ```
-
-       **Array/String Problems:**
-       ```python
-       def run_demo(self):
-           test_input = "babad"  # From problem example
-           result = self.longestPalindrome(test_input)
-           return result
-       ```
-
-       **Tree Problems:**
-       ```python
-       def run_demo(self):
-           class TreeNode:
-               def __init__(self, val=0, left=None, right=None):
-                   self.val = val
-                   self.left = left
-                   self.right = right
-
-           # Build test tree
-           root = TreeNode(3)
-           root.left = TreeNode(9)
-           root.right = TreeNode(20, TreeNode(15), TreeNode(7))
-
-           result = self.maxDepth(root)
-           return result
-       ```
-
-       **Graph Problems:**
-       ```python
-       def run_demo(self):
-           graph = [[1,2], [0,2], [0,1]]  # From problem example
-           result = self.isBipartite(graph)
-           return result
-       ```
-
-       **Mathematical/Single-Value Problems (sqrt, pow, etc.):**
-       ```python
-       def run_demo(self):
-           x = 4  # EXACT value from problem example - DO NOT create arrays!
-           result = self.mySqrt(x)
-           return result
-       ```
-
-       IMPORTANT FOR MATHEMATICAL PROBLEMS:
-       - If input is a single number like x=4, visualize it as 'x': 4, NOT as an array!
-       - Show the actual search boundaries (low, high) as they change
-       - Do NOT fabricate arrays like [1,2,3,4,5] - that's NOT the user's input!
+{run_demo_examples}
 
     3. **LOGGING STRATEGY** (CRITICAL):
        ❌ BAD: Log every single variable assignment (creates 20+ micro-steps)
@@ -295,18 +158,117 @@ async def run_instrumenter(blueprint: dict, normalized_data: dict) -> dict:
 
     7. **COMPLETE EXAMPLE CODE PATTERNS**:
 
-       **Example A - String Problem (palindrome):**
+{code_pattern_examples}
+
+    GENERATE CODE:
+    - MUST include run_demo() method with NO parameters
+    - run_demo() extracts test data from problem description
+    - Aim for 10-15 log calls total (not 20+)
+    - Each log should represent a significant algorithm step
+    - Always include input data in first log
+    - Group related variables together
+    - Use meaningful step descriptions
+
+    Return JSON:
+    {{
+        "code": "Full Python code as string (MUST include run_demo() method)",
+        "entry_point": "run_demo",
+        "complexity_analysis": "Time and space complexity explanation"
+    }}
+
+    CRITICAL REMINDER:
+    - entry_point MUST be "run_demo"
+    - run_demo() must take NO parameters
+    - run_demo() creates test data internally based on problem description
+    - This makes the code self-contained and executable without external inputs
+
+    Algorithm to implement: {strategy}
+
+    {example_section}
+    """
+
+
+# Per-family run_demo examples for the full prompt. A given problem only
+# needs the family it actually uses, so classification picks one block and
+# the prompt drops the other four (~70% of the example tokens); the
+# generic fallback ships everything, matching the old prompt, when the
+# problem cannot be classified.
+_RUN_DEMO_EXAMPLES = {
+    "linked_list": """       **Linked List Problems:**
+       ```python
+       def run_demo(self):
+           class ListNode:
+               def __init__(self, val=0, next=None):
+                   self.val = val
+                   self.next = next
+
+           # Build test list from problem example
+           head = ListNode(1, ListNode(2, ListNode(3, ListNode(4, ListNode(5)))))
+           k = 2  # Extract k value from problem description
+
+           result = self.reverseKGroup(head, k)
+           return result
+       ```""",
+    "array": """       **Array/String Problems:**
+       ```python
+       def run_demo(self):
+           test_input = "babad"  # From problem example
+           result = self.longestPalindrome(test_input)
+           return result
+       ```""",
+    "tree": """       **Tree Problems:**
+       ```python
+       def run_demo(self):
+           class TreeNode:
+               def __init__(self, val=0, left=None, right=None):
+                   self.val = val
+                   self.left = left
+                   self.right = right
+
+           # Build test tree
+           root = TreeNode(3)
+           root.left = TreeNode(9)
+           root.right = TreeNode(20, TreeNode(15), TreeNode(7))
+
+           result = self.maxDepth(root)
+           return result
+       ```""",
+    "graph": """       **Graph Problems:**
+       ```python
+       def run_demo(self):
+           graph = [[1,2], [0,2], [0,1]]  # From problem example
+           result = self.isBipartite(graph)
+           return result
+       ```""",
+    "math": """       **Mathematical/Single-Value Problems (sqrt, pow, etc.):**
+       ```python
+       def run_demo(self):
+           x = 4  # EXACT value from problem example - DO NOT create arrays!
+           result = self.mySqrt(x)
+           return result
+       ```
+
+       IMPORTANT FOR MATHEMATICAL PROBLEMS:
+       - If input is a single number like x=4, visualize it as 'x': 4, NOT as an array!
+       - Show the actual search boundaries (low, high) as they change
+       - Do NOT fabricate arrays like [1,2,3,4,5] - that's NOT the user's input!""",
+}
+
+_GENERIC_RUN_DEMO_EXAMPLES = "\n\n".join(_RUN_DEMO_EXAMPLES.values())
+
+_CODE_PATTERN_EXAMPLES = {
+    "array": """       **Example A - String Problem (palindrome):**
        ```python
        class Solution:
            def __init__(self):
                self.trace = []
 
            def log(self, step, vars, highlights):
-               self.trace.append({{
+               self.trace.append({
                    'step': step,
                    'vars': vars,
                    'highlights': highlights
-               }})
+               })
 
            def run_demo(self):
                test_string = "babad"  # From problem example
@@ -314,27 +276,26 @@ async def run_instrumenter(blueprint: dict, normalized_data: dict) -> dict:
                return result
 
            def longestPalindrome(self, s):
-               self.log('Initialize', {{
+               self.log('Initialize', {
                    'input_s': list(s),
                    'start': 0,
                    'end': 0
-               }}, ['input_s'])
+               }, ['input_s'])
                # ... algorithm logic with meaningful logs
                return s[start:end+1]
-       ```
-
-       **Example B - Mathematical Problem (sqrt, binary search on range):**
+       ```""",
+    "math": """       **Example B - Mathematical Problem (sqrt, binary search on range):**
        ```python
        class Solution:
            def __init__(self):
                self.trace = []
 
            def log(self, step, vars, highlights):
-               self.trace.append({{
+               self.trace.append({
                    'step': step,
                    'vars': vars,
                    'highlights': highlights
-               }})
+               })
 
            def run_demo(self):
                x = 4  # EXACT input from problem - just the number!
@@ -343,22 +304,22 @@ async def run_instrumenter(blueprint: dict, normalized_data: dict) -> dict:
 
            def mySqrt(self, x):
                # Show ACTUAL input x, not a fabricated array!
-               self.log('Initialize binary search', {{
+               self.log('Initialize binary search', {
                    'x': x,           # The actual input: 4
                    'low': 0,         # Search boundary
                    'high': x         # Search boundary
-               }}, ['x'])
+               }, ['x'])
 
                low, high = 0, x
                while low <= high:
                    mid = (low + high) // 2
-                   self.log('Check middle value', {{
+                   self.log('Check middle value', {
                        'x': x,
                        'low': low,
                        'high': high,
                        'mid': mid,
                        'mid_squared': mid * mid
-                   }}, ['mid'])
+                   }, ['mid'])
 
                    if mid * mid == x:
                        return mid
@@ -370,36 +331,158 @@ async def run_instrumenter(blueprint: dict, normalized_data: dict) -> dict:
        ```
 
        ⚠️ WRONG for sqrt: Creating INPUT_ARRAY: [1,2,3,4,5] - that's NOT the input!
-       ✅ CORRECT for sqrt: Showing x: 4, low: 0, high: 4 - the actual values!
+       ✅ CORRECT for sqrt: Showing x: 4, low: 0, high: 4 - the actual values!""",
+}
 
-    GENERATE CODE:
-    - MUST include run_demo() method with NO parameters
-    - run_demo() extracts test data from problem description
-    - Aim for 10-15 log calls total (not 20+)
-    - Each log should represent a significant algorithm step
-    - Always include input data in first log
-    - Group related variables together
-    - Use meaningful step descriptions
+_GENERIC_CODE_PATTERNS = _CODE_PATTERN_EXAMPLES["array"] + "\n\n" + _CODE_PATTERN_EXAMPLES["math"]
 
-    Return JSON:
-    {{
-        "code": "Full Python code as string (MUST include run_demo() method)",
-        "entry_point": "run_demo",
-        "complexity_analysis": "Time and space complexity explanation"
-    }}
 
-    CRITICAL REMINDER:
-    - entry_point MUST be "run_demo"
-    - run_demo() must take NO parameters
-    - run_demo() creates test data internally based on problem description
-    - This makes the code self-contained and executable without external inputs
+def _classify_data_structure(blueprint: dict, normalized_data: dict):
+    """Best-effort guess at the problem's data-structure family.
+
+    Checks the strategist's blueprint first, then the shape of the first
+    example's input_vars. Returns None when uncertain so the caller can
+    fall back to the full example set.
+    """
+    ds = str(blueprint.get('data_structure', '')).lower()
+    for name in ("linked_list", "graph", "tree", "math", "array"):
+        if name in ds or name.replace('_', ' ') in ds:
+            return name
+    if 'string' in ds or 'list' in ds:
+        return "array"
+
+    example_inputs = normalized_data.get('example_inputs') or [{}]
+    input_vars = example_inputs[0].get('input_vars') or {}
+    keys = {str(k).lower() for k in input_vars}
+    if keys & {"head", "list1", "list2"}:
+        return "linked_list"
+    if "root" in keys:
+        return "tree"
+    if keys & {"graph", "edges", "adj", "adjacency"}:
+        return "graph"
+    if input_vars and all(isinstance(v, (int, float)) and not isinstance(v, bool)
+                          for v in input_vars.values()):
+        return "math"
+    if any(isinstance(v, (list, str)) for v in input_vars.values()):
+        return "array"
+    return None
+
+
+
+def _compile_example_tmpl(tmpl: str):
+    """Pre-split an example template into literal parts at import time.
+
+    format_map re-parses the template string on every call; rendering it
+    once here (which also folds the doubled braces) and splitting on the
+    two placeholders reduces each request to a three-way concatenation.
+    """
+    iv, eo = "\x00IV\x00", "\x00EO\x00"
+    rendered = tmpl.format_map({"input_vars_json": iv, "expected_output": eo})
+    head, rest = rendered.split(iv)
+    mid, tail = rest.split(eo)
+
+    def render(input_vars_json: str, expected_output) -> str:
+        return f"{head}{input_vars_json}{mid}{expected_output}{tail}"
+
+    return render
+
+
+_RENDER_EXAMPLE = _compile_example_tmpl(_EXAMPLE_SECTION_TMPL)
+_RENDER_EXAMPLE_FULL = _compile_example_tmpl(_EXAMPLE_SECTION_FULL_TMPL)
+
+
+def _build_example_section(example_inputs: list, render) -> str:
+    """Render the example footer for the prompt, or the no-example stub."""
+    if example_inputs:
+        first_example = example_inputs[0]
+        return render(
+            orjson.dumps(first_example.get('input_vars', {})).decode(),
+            first_example.get('expected_output', 'Unknown'),
+        )
+    return _NO_EXAMPLE_SECTION
+
+
+async def run_instrumenter_with_provider(llm_provider, blueprint: dict, normalized_data: dict) -> dict:
+    """
+    Generate instrumented Python code using provided LLM provider.
+
+    Args:
+        llm_provider: LLM provider instance (from Pipeline)
+        blueprint: Output from strategist agent
+        normalized_data: Output from normalizer (includes example inputs)
+
+    Returns:
+        Dictionary with generated code and entry point
     """
+    strategy = blueprint.get('selected_strategy_for_instrumentation', 'Unknown')
+    example_inputs = normalized_data.get('example_inputs', [])
+
+    logger.info(f"Generating instrumented code for: {strategy}")
+    if example_inputs:
+        logger.info(f"Using example inputs: {example_inputs[0].get('input_vars', {})}")
+
+    example_section = _build_example_section(example_inputs, _RENDER_EXAMPLE)
+
+    prompt = _INSTRUMENTER_PROMPT_TMPL.format_map({"strategy": strategy, "example_section": example_section})
+
+    try:
+        logger.debug("Calling LLM for code generation...")
+        response_text = await llm_provider.call(prompt, system_instruction=_INSTRUMENTER_SYSTEM, json_mode=True)
+
+        code_data = orjson.loads(response_text)
+
+        entry_point = code_data.get('entry_point', 'Unknown')
+        code_length = len(code_data.get('code', ''))
+
+        logger.info(f"Code generated: {code_length} characters")
+        logger.info(f"Entry point: {entry_point}")
+        logger.debug(f"Code preview:\n{code_data.get('code', '')[:300]}...")
+
+        return code_data
+
+    except Exception as e:
+        log_error_with_context(logger, e, {"strategy": strategy})
+        raise
+
+
+async def run_instrumenter(blueprint: dict, normalized_data: dict) -> dict:
+    """
+    Generate instrumented Python code for the selected algorithm
+
+    Args:
+        blueprint: Output from strategist agent
+        normalized_data: Output from normalizer (includes example inputs)
+
+    Returns:
+        Dictionary with generated code and entry point
+    """
+    strategy = blueprint.get('selected_strategy_for_instrumentation', 'Unknown')
+    example_inputs = normalized_data.get('example_inputs', [])
+
+    logger.info(f"Generating instrumented code for: {strategy}")
+    if example_inputs:
+        logger.info(f"Using example inputs: {example_inputs[0].get('input_vars', {})}")
+
+    example_section = _build_example_section(example_inputs, _RENDER_EXAMPLE_FULL)
+
+    family = _classify_data_structure(blueprint, normalized_data)
+    if family:
+        logger.info(f"Classified problem as {family}; sending only its example block")
+
+    prompt = _INSTRUMENTER_PROMPT_FULL_TMPL.format_map({
+        "strategy": strategy,
+        "example_section": example_section,
+        "run_demo_examples": _RUN_DEMO_EXAMPLES.get(family, _GENERIC_RUN_DEMO_EXAMPLES),
+        "code_pattern_examples": _CODE_PATTERN_EXAMPLES.get(family, _GENERIC_CODE_PATTERNS),
+    })
 
     try:
         logger.debug("Calling LLM (Pro tier) for code generation...")
-        response_text = await llm.call(prompt, system_instruction=system_instruction, json_mode=True, model_tier="pro")
+        # Imported lazily so module load skips provider SDK initialization
+        from app.utils.llm_provider import llm
+        response_text = await llm.call(prompt, system_instruction=_INSTRUMENTER_SYSTEM, json_mode=True, model_tier="pro")
 
-        code_data = json.loads(response_text)
+        code_data = orjson.loads(response_text)
 
         entry_point = code_data.get('entry_point', 'Unknown')
         code_length = len(code_data.get('code', ''))
@@ -1,15 +1,126 @@
 
-import json
+import asyncio
+import functools
+import hashlib
+import itertools
+import logging
+import orjson
 import random
+import re
+from app.cache.memory_cache import MemoryCache
 from app.utils.llm_provider import llm
 from app.utils.logger import get_logger, log_error_with_context
 
 logger = get_logger("narrator")
 
-# VERSION MARKER - This prints when module is loaded
-print("=" * 60)
-print("NARRATOR MODULE LOADED - VERSION 2026-02-04-v6 (Input Data Fix)")
-print("=" * 60)
+# Compiled once - quiz validation runs these per frame, per narrative
+_COMMENTARY_NUM_RE = re.compile(r'=\s*(\d+)')
+_WORD_RE = re.compile(r'\b\w+\b')
+_DIGIT_RE = re.compile(r'\d')
+# Strips markdown heading markers in one pass (translate beats regex for
+# single-character removal)
+_HASH_TABLE = str.maketrans('', '', '#')
+
+# Options that should always appear at the end of a quiz ("None of the
+# above" and friends). The compiled alternation checks all patterns in a
+# single pass instead of one substring scan per pattern per option - at
+# 14 literal patterns this matches a dedicated Aho-Corasick automaton
+# without pulling in another dependency.
+_END_OPTION_PATTERNS = (
+    "none of the above",
+    "all of the above",
+    "cannot be determined",
+    "not enough information",
+    "skip this step",
+    "this step is not needed",
+    "continue without changes",
+    "return an error",
+    "restart the algorithm",
+    "terminate early",
+    "undo the previous",
+    "alternative approach",
+    "not applicable",
+    "n/a",
+)
+_END_OPTION_RE = re.compile('|'.join(re.escape(p) for p in _END_OPTION_PATTERNS))
+
+# Fallback quizzes attached to frames the LLM left without one; option
+# tuples live here and are materialized per frame only because the
+# shuffle mutates the list in place
+_FIRST_QUIZ_QUESTION = 'What is the first step in this algorithm?'
+_FIRST_QUIZ_OPTIONS = (
+    'Initialize variables and set up data structures',
+    'Start processing from the end',
+    'Skip initialization and process directly',
+    'Return immediately without processing',
+)
+_LAST_QUIZ_QUESTION = 'What happens in this final step?'
+_LAST_QUIZ_OPTIONS = (
+    'Return the computed result',
+    'Continue iterating indefinitely',
+    'Discard all computed values',
+    'Restart the algorithm from beginning',
+)
+_MID_QUIZ_QUESTION = 'What is the purpose of this step?'
+_MID_QUIZ_OPTIONS = (
+    # First slot is replaced with the frame's own short description
+    'Process the current element',
+    'Skip this element and move to next',
+    'Undo the previous operation',
+    'Terminate early with partial result',
+)
+
+# Filler options used to pad short quizzes up to four choices
+_FALLBACK_QUIZ_OPTIONS = (
+    "None of the above",
+    "Skip this step",
+    "This step is not needed",
+    "Cannot be determined",
+    "All of the above",
+    "Restart the algorithm",
+    "Return an error",
+    "Continue without changes",
+)
+
+logger.info("narrator module loaded v2026-02-04-v6")
+
+
+def _extract_key_values(data, key_value_map):
+    """Flatten numeric values out of frame data into key_value_map.
+
+    Each entry maps a lowered key to (pre-split key words, value string).
+    Module-level rather than a closure so the map is a plain argument -
+    every name here resolves as a local instead of a cell variable, and no
+    function object is rebuilt per validation call. Deliberately stays
+    pure Python: the walk is string-keyed dict dispatch over small frame
+    payloads, which a JIT like numba cannot compile in nopython mode
+    without flattening to typed arrays first - more conversion cost than
+    the loop itself.
+    """
+    stack = [('', data)] if isinstance(data, dict) else []
+    while stack:
+        prefix, d = stack.pop()
+        for k, v in d.items():
+            tv = type(v)
+            full_key = f"{prefix}_{k}" if prefix else k
+            s = None
+            if tv is int or tv is float:
+                s = str(int(v) if tv is float and v.is_integer() else v)
+            elif tv is list and len(v) == 1:
+                # Single-element list like [5] or ['5']
+                val = v[0]
+                tval = type(val)
+                if tval is int or tval is float:
+                    s = str(int(val) if tval is float and val.is_integer() else val)
+                elif tval is str and val.isdigit():
+                    s = val
+            elif tv is dict:
+                stack.append((k, v))
+            if s is not None:
+                kl = k.lower()
+                fkl = full_key.lower()
+                key_value_map[kl] = (tuple(kl.replace('_', ' ').split()), s)
+                key_value_map[fkl] = (tuple(fkl.replace('_', ' ').split()), s)
 
 
 def _validate_quiz_answer(quiz: dict, frame_data: dict, commentary: str) -> dict:
@@ -17,94 +128,66 @@ def _validate_quiz_answer(quiz: dict, frame_data: dict, commentary: str) -> dict
     Validate and correct quiz answers by checking against frame data.
     This ensures the correct answer actually matches the visible data.
     """
-    import re
-
-    print("=" * 60)
-    print("QUIZ VALIDATION FUNCTION CALLED")
-    print("=" * 60)
-
     if not quiz or 'options' not in quiz or 'correct' not in quiz:
-        print("QUIZ VALIDATION: Quiz invalid, skipping")
+        logger.debug("QUIZ VALIDATION: Quiz invalid, skipping")
         return quiz
 
     question = quiz.get('question', '').lower()
     options = quiz['options']
-    current_correct = quiz['correct']
 
-    print(f"QUIZ VALIDATION: Question: {question}")
-    print(f"QUIZ VALIDATION: Options: {options}")
-    print(f"QUIZ VALIDATION: Current correct index: {current_correct} = '{options[current_correct] if current_correct < len(options) else 'OUT OF BOUNDS'}'")
-    print(f"QUIZ VALIDATION: Frame data: {frame_data}")
-    print(f"QUIZ VALIDATION: Commentary: {commentary[:100]}...")
+    # Validation can only ever move 'correct' to a numeric option that
+    # matches frame data; with no digit in the question or any option
+    # there is nothing to correct, so skip the extraction machinery
+    if not _DIGIT_RE.search(question) and not any(_DIGIT_RE.search(str(o)) for o in options):
+        return quiz
 
-    logger.info(f"QUIZ VALIDATION: Question: {question[:60]}...")
-    logger.info(f"QUIZ VALIDATION: Frame data keys: {list(frame_data.keys())}")
+    current_correct = quiz['correct']
+    # Normalize each option once - both match loops below reuse these
+    normalized_opts = [str(o).strip() for o in options]
 
-    # Build a map of key names to their values
-    key_value_map = {}
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("QUIZ VALIDATION: Question: %s", question)
+        logger.debug("QUIZ VALIDATION: Options: %s, correct index: %s", options, current_correct)
+        logger.debug("QUIZ VALIDATION: Frame data: %s", frame_data)
 
-    def extract_key_values(data, prefix=''):
-        if isinstance(data, dict):
-            for k, v in data.items():
-                full_key = f"{prefix}_{k}" if prefix else k
-                if isinstance(v, (int, float)):
-                    key_value_map[k.lower()] = str(int(v) if isinstance(v, float) and v.is_integer() else v)
-                    key_value_map[full_key.lower()] = str(int(v) if isinstance(v, float) and v.is_integer() else v)
-                elif isinstance(v, list) and len(v) == 1 and isinstance(v[0], (int, float)):
-                    # Single-element list like [5]
-                    val = v[0]
-                    key_value_map[k.lower()] = str(int(val) if isinstance(val, float) and val.is_integer() else val)
-                    key_value_map[full_key.lower()] = str(int(val) if isinstance(val, float) and val.is_integer() else val)
-                elif isinstance(v, list) and len(v) == 1 and isinstance(v[0], str) and v[0].isdigit():
-                    key_value_map[k.lower()] = v[0]
-                    key_value_map[full_key.lower()] = v[0]
-                elif isinstance(v, dict):
-                    extract_key_values(v, k)
-
-    extract_key_values(frame_data)
-    logger.info(f"QUIZ VALIDATION: Key-value map: {key_value_map}")
+    # Map of lowered key names to (pre-split key words, value string)
+    key_value_map = {}
+    _extract_key_values(frame_data, key_value_map)
+    logger.debug("QUIZ VALIDATION: Key-value map: %s", key_value_map)
 
     # Extract all numeric values from frame data
-    frame_values = set(key_value_map.values())
+    frame_values = {v for _, v in key_value_map.values()}
 
-    # Also extract numbers from commentary (especially after = sign)
-    commentary_results = re.findall(r'=\s*(\d+)', commentary)
-    for num in commentary_results:
-        frame_values.add(num)
-    logger.info(f"QUIZ VALIDATION: All frame values: {frame_values}")
+    # Also extract numbers from commentary (especially after = sign);
+    # membership is the only use, so a frozenset beats the list scan
+    commentary_results = frozenset(_COMMENTARY_NUM_RE.findall(commentary))
+    frame_values |= commentary_results
+    logger.debug("QUIZ VALIDATION: All frame values: %s", frame_values)
 
     # Try to match question keywords to frame data keys
     # e.g., "total candies" should match "TOTAL_CANDIES"
-    question_words = re.findall(r'\b\w+\b', question.lower())
+    question_words = frozenset(_WORD_RE.findall(question))
 
-    # Check for direct key matches
+    # Check for direct key matches - hashed membership per key word
     expected_value = None
-    for key, value in key_value_map.items():
-        key_words = key.replace('_', ' ').lower().split()
-        # Check if key words appear in question
+    for key, (key_words, value) in key_value_map.items():
         if all(word in question_words for word in key_words):
             expected_value = value
-            logger.info(f"QUIZ VALIDATION: Key '{key}' matches question, expected value: {value}")
+            logger.debug("QUIZ VALIDATION: Key '%s' matches question, expected value: %s", key, value)
             break
 
     # If we found an expected value, verify the answer
     if expected_value:
-        print(f"QUIZ VALIDATION: Expected value from data: {expected_value}")
         # Find which option matches the expected value
-        for idx, opt in enumerate(options):
-            opt_str = str(opt).strip()
-            print(f"QUIZ VALIDATION: Checking option {idx}: '{opt_str}' == '{expected_value}' ? {opt_str == expected_value}")
+        for idx, opt_str in enumerate(normalized_opts):
             if opt_str == expected_value:
                 if idx != current_correct:
-                    print(f"!!! QUIZ VALIDATION: CORRECTING answer from index {current_correct} ('{options[current_correct]}') to index {idx} ('{opt_str}')")
-                    logger.warning(f"QUIZ VALIDATION: CORRECTING answer from '{options[current_correct]}' to '{opt_str}' (matches key value)")
+                    logger.warning("QUIZ VALIDATION: CORRECTING answer from '%s' to '%s' (matches key value)", options[current_correct], opt_str)
                     quiz['correct'] = idx
                 else:
-                    print(f"QUIZ VALIDATION: Answer '{opt_str}' is already correct at index {idx}")
-                    logger.info(f"QUIZ VALIDATION: Answer '{opt_str}' is already correct")
-                print(f"QUIZ VALIDATION RESULT: correct = {quiz['correct']}")
+                    logger.debug("QUIZ VALIDATION: Answer '%s' is already correct", opt_str)
                 return quiz
-        print(f"QUIZ VALIDATION: Expected value '{expected_value}' not found in options!")
+        logger.debug("QUIZ VALIDATION: Expected value '%s' not found in options", expected_value)
 
     # Fallback: Check if question asks for a numeric value
     value_keywords = ['total', 'count', 'number', 'sum', 'result', 'answer', 'value',
@@ -115,31 +198,28 @@ def _validate_quiz_answer(quiz: dict, frame_data: dict, commentary: str) -> dict
     if asks_for_value and frame_values:
         # Find which options match frame values
         matching_options = []
-        for idx, opt in enumerate(options):
-            opt_str = str(opt).strip()
+        for idx, opt_str in enumerate(normalized_opts):
             if opt_str in frame_values:
                 matching_options.append((idx, opt_str))
 
-        logger.info(f"QUIZ VALIDATION: Options matching frame values: {matching_options}")
+        logger.debug("QUIZ VALIDATION: Options matching frame values: %s", matching_options)
 
         # If exactly one option matches a frame value, that's likely correct
         if len(matching_options) == 1:
             correct_idx, correct_val = matching_options[0]
             if correct_idx != current_correct:
-                logger.warning(f"QUIZ VALIDATION: CORRECTING answer from '{options[current_correct]}' to '{correct_val}' (only match)")
+                logger.warning("QUIZ VALIDATION: CORRECTING answer from '%s' to '%s' (only match)", options[current_correct], correct_val)
                 quiz['correct'] = correct_idx
         elif len(matching_options) > 1:
             # Multiple matches - prefer the one in commentary results
             for idx, val in matching_options:
                 if val in commentary_results:
                     if idx != current_correct:
-                        print(f"!!! QUIZ VALIDATION: CORRECTING answer to '{val}' (found in commentary)")
-                        logger.warning(f"QUIZ VALIDATION: CORRECTING answer to '{val}' (found in commentary)")
+                        logger.warning("QUIZ VALIDATION: CORRECTING answer to '%s' (found in commentary)", val)
                         quiz['correct'] = idx
                     break
 
-    print(f"QUIZ VALIDATION FINAL: correct index = {quiz['correct']}, answer = '{quiz['options'][quiz['correct']]}'")
-    print("=" * 60)
+    logger.debug("QUIZ VALIDATION FINAL: correct index = %s", quiz['correct'])
     return quiz
 
 
@@ -156,51 +236,28 @@ def _shuffle_quiz_options(quiz: dict) -> dict:
     options = list(quiz['options'])  # Make a copy
     correct_idx = quiz['correct']
 
-    print(f"[SHUFFLE] Input options: {options}")
-    print(f"[SHUFFLE] Input correct index: {correct_idx}")
+    logger.debug("[SHUFFLE] Input options: %s, correct index: %s", options, correct_idx)
 
     # Validate correct index
     if correct_idx < 0 or correct_idx >= len(options):
         correct_idx = 0
 
-    # Options that should always appear at the end (position 4)
-    end_option_patterns = [
-        "none of the above",
-        "all of the above",
-        "cannot be determined",
-        "not enough information",
-        "skip this step",
-        "this step is not needed",
-        "continue without changes",
-        "return an error",
-        "restart the algorithm",
-        "terminate early",
-        "undo the previous",
-        "alternative approach",
-        "not applicable",
-        "n/a"
-    ]
-
     # Separate regular options from "end" options
     regular_options = []
     end_option_items = []
 
+    opt_lowers = [str(o).lower().strip() for o in options]
     for i, opt in enumerate(options):
-        opt_lower = str(opt).lower().strip()
-        is_end_option = any(pattern in opt_lower for pattern in end_option_patterns)
-
-        print(f"[SHUFFLE] Option {i}: '{opt}' -> is_end_option: {is_end_option}")
+        is_end_option = _END_OPTION_RE.search(opt_lowers[i]) is not None
 
         if is_end_option:
             end_option_items.append((opt, i == correct_idx))
         else:
             regular_options.append((opt, i == correct_idx))
 
-    print(f"[SHUFFLE] Regular options: {[o[0] for o in regular_options]}")
-    print(f"[SHUFFLE] End options: {[o[0] for o in end_option_items]}")
-
-    # Shuffle only the regular options
-    random.shuffle(regular_options)
+    # Shuffle only the regular options - sample(k=len) permutes in C
+    # instead of the Python-level Fisher-Yates swap loop
+    regular_options = random.sample(regular_options, len(regular_options))
 
     # Combine: regular options first, then end options
     combined = regular_options + end_option_items
@@ -212,14 +269,89 @@ def _shuffle_quiz_options(quiz: dict) -> dict:
     quiz['options'] = shuffled_options
     quiz['correct'] = new_correct_idx
 
-    print(f"[SHUFFLE] Output options: {shuffled_options}")
-    print(f"[SHUFFLE] Output correct index: {new_correct_idx}")
-
-    logger.debug(f"Shuffled quiz: correct moved from index {correct_idx} to {new_correct_idx}")
+    logger.debug("Shuffled quiz: correct moved from index %s to %s", correct_idx, new_correct_idx)
 
     return quiz
 
 
+
+# Windowing parameters for long traces: instead of truncating to the first
+# 20 steps (losing everything after), the trace is split into overlapping
+# windows that are all narrated in a single batched LLM call.
+_TRACE_WINDOW_SIZE = 20
+_TRACE_WINDOW_OVERLAP = 2
+_MAX_TRACE_WINDOWS = 5
+
+
+def _trace_windows(trace_data: list, size: int = _TRACE_WINDOW_SIZE,
+                   overlap: int = _TRACE_WINDOW_OVERLAP) -> list:
+    """Split a trace into overlapping windows of ~size steps.
+
+    The overlap carries boundary context between windows so the narration
+    stays continuous. Short traces come back as a single window.
+    """
+    if len(trace_data) <= size:
+        return [trace_data]
+    windows = []
+    step = size - overlap
+    for start in range(0, len(trace_data), step):
+        windows.append(trace_data[start:start + size])
+        if len(windows) >= _MAX_TRACE_WINDOWS or start + size >= len(trace_data):
+            break
+    return windows
+
+
+# Narratives for the same algorithm on the same trace are identical across
+# users, so a content-addressed cache turns repeat runs into a hash lookup
+# instead of a Pro-tier round-trip
+_narrative_cache = MemoryCache(max_size=256, default_ttl=86400)
+
+
+def _narrative_cache_key(algo_name: str, trace_data: list, normalized_data: dict, blueprint: dict):
+    """sha256 over the canonical inputs, or None if they don't serialize.
+
+    The full trace is hashed - narration consumes several windows of it,
+    so keying on a prefix would collide traces that diverge later.
+    """
+    try:
+        canonical = orjson.dumps(
+            {"algo": algo_name, "trace": trace_data,
+             "norm": normalized_data or {}, "bp": blueprint or {}},
+            option=orjson.OPT_SORT_KEYS)
+    except TypeError:
+        return None
+    return hashlib.sha256(canonical).hexdigest()
+
+
+def _narrative_looks_complete(narrative: dict, min_frames: int) -> bool:
+    """Cheap structural check deciding whether a flash-tier attempt suffices."""
+    if not isinstance(narrative, dict):
+        return False
+    frames = narrative.get('frames') or []
+    if not frames and narrative.get('frames_per_window'):
+        frames = [f for w in narrative['frames_per_window'] if isinstance(w, list) for f in w]
+    return len(frames) >= min_frames and all(isinstance(f, dict) and 'state' in f for f in frames)
+
+
+def _fallback_frame(i: int, t: dict, input_data) -> dict:
+    """Build one simplified fallback frame from a raw trace entry."""
+    g = t.get  # bound once - this runs per trace entry in the fallback loop
+    vars_data = g("vars", {})
+    step_desc = g('step', f'Processing step {i + 1}')
+    if not vars_data:
+        vars_data = {'STEP': [i + 1], 'STATUS': [step_desc]}
+        if input_data:
+            vars_data['INPUT_DATA'] = list(input_data)  # fresh list per frame, never aliased
+    highlights = g("highlights", [])
+    valid_highlights = [h for h in highlights if isinstance(h, str) and h.partition('[')[0] in vars_data]
+    return {
+        "step_id": i,
+        "commentary": f"Step {i + 1}: {step_desc}",
+        "state": {"visual_type": "array", "data": vars_data, "highlights": valid_highlights},
+        "quiz": None
+    }
+
+
 async def run_narrator_with_provider(llm_provider, trace_data: list, algo_name: str, normalized_data: dict = None, blueprint: dict = None) -> dict:
     """
     Transform raw execution trace into educational narrative using provided LLM provider.
@@ -234,7 +366,7 @@ async def run_narrator_with_provider(llm_provider, trace_data: list, algo_name:
     Returns:
         Complete trace data with frames, commentary, and quizzes
     """
-    logger.info(f"Generating narrative for: {algo_name}")
+    logger.info("Generating narrative for: %s", algo_name)
 
     if not trace_data:
         logger.warning("No trace data provided")
@@ -250,127 +382,111 @@ async def run_narrator_with_provider(llm_provider, trace_data: list, algo_name:
             "frames": []
         }
 
-    logger.info(f"Processing {len(trace_data)} trace steps")
+    logger.info("Processing %s trace steps", len(trace_data))
 
-    # Limit trace data sent to LLM
-    trace_preview = trace_data[:20]
+    # Window the trace so long traces keep their later steps (all windows
+    # ride in the same LLM call)
+    windows = _trace_windows(trace_data)
+    trace_preview = windows[0]
 
-    # Build context sections
-    problem_context = ""
-    if normalized_data:
-        objective = normalized_data.get('objective', 'N/A')
-        example_inputs = normalized_data.get('example_inputs', [])
-        problem_context = f"""
-    PROBLEM CONTEXT:
-    Problem Objective: {objective}
-    Example Inputs: {json.dumps(example_inputs, indent=2) if example_inputs else 'No specific examples'}
-    """
-
-    algorithm_context = ""
-    if blueprint:
-        analysis = blueprint.get('analysis_summary', '')
-        algorithm_context = f"""
-    ALGORITHM SELECTION CONTEXT:
-    Why This Algorithm Was Chosen: {analysis}
-    """
-
-    system_instruction = """You are an expert Algorithms Professor creating educational algorithm visualizations.
-    Your goal is to synthesize raw execution traces into clear, step-by-step visualizations."""
-
-    prompt = f"""
-    Algorithm: {algo_name}
-    Raw Execution Trace: {json.dumps(trace_preview, indent=2)}
-
-    {problem_context}
-    {algorithm_context}
-
-    REQUIREMENTS:
-    1. Create 10-15 LOGICAL frames (consolidate micro-steps)
-    2. Include INPUT data in EVERY frame
-    3. Add a quiz to EVERY frame - each step should test understanding
-    4. Use descriptive variable containers (INPUT_S, POINTERS, etc.)
+    # Compact orjson output: faster than indented stdlib json and the
+    # smaller prompt costs fewer tokens per narration
+    if len(windows) > 1:
+        trace_block = orjson.dumps({"windows": windows}).decode()
+    else:
+        trace_block = orjson.dumps(trace_preview).decode()
 
-    Return JSON with: title, strategy, strategy_details, complexity, frames
-    Each frame: step_id, commentary, state (visual_type, data, highlights), quiz (optional)
-    """
+    # Pre-serialize the variable inputs into hashable strings so the prompt
+    # assembly below can be memoized across retries of the same narration
+    example_inputs = (normalized_data or {}).get('example_inputs', [])
+    prompt = _provider_prompt(
+        algo_name, trace_block, len(windows) > 1,
+        str((normalized_data or {}).get('objective') or ''),
+        orjson.dumps(example_inputs).decode() if example_inputs else "",
+        (blueprint or {}).get('analysis_summary', '') or "")
 
     try:
         logger.info("Calling LLM for narrative generation...")
-        response_text = await llm_provider.call(prompt, system_instruction=system_instruction, json_mode=True)
+        response_text = await llm_provider.call(prompt, system_instruction=_PROVIDER_SYSTEM, json_mode=True)
 
-        narrative = json.loads(response_text)
-        logger.info(f"LLM returned narrative with {len(narrative.get('frames', []))} frames")
+        # orjson caches short map keys on parse, so the repeated
+        # 'state'/'data'/'quiz' lookups below hit identity-fast paths
+        narrative = orjson.loads(response_text)
+        logger.info("LLM returned narrative with %s frames", len(narrative.get('frames', [])))
 
         # Log first frame structure for debugging
         if narrative.get('frames'):
             first_frame = narrative['frames'][0]
             first_state = first_frame.get('state', {})
             first_data = first_state.get('data', {})
-            logger.info(f"BEFORE POST-PROCESS - First frame:")
-            logger.info(f"  - state keys: {list(first_state.keys()) if isinstance(first_state, dict) else 'not a dict'}")
-            logger.info(f"  - data keys: {list(first_data.keys()) if isinstance(first_data, dict) else 'not a dict'}")
-            logger.info(f"  - data empty: {not first_data or len(first_data) == 0}")
+            logger.info("BEFORE POST-PROCESS - First frame:")
+            logger.info("  - state keys: %s", list(first_state.keys()) if isinstance(first_state, dict) else 'not a dict')
+            logger.info("  - data keys: %s", list(first_data.keys()) if isinstance(first_data, dict) else 'not a dict')
+            logger.info("  - data empty: %s", not first_data or len(first_data) == 0)
 
         # Log trace_data info
-        logger.info(f"trace_data has {len(trace_data) if trace_data else 0} entries")
+        logger.info("trace_data has %s entries", len(trace_data) if trace_data else 0)
         if trace_data and len(trace_data) > 0:
             first_trace_vars = trace_data[0].get('vars', {})
-            logger.info(f"First trace vars keys: {list(first_trace_vars.keys()) if first_trace_vars else 'EMPTY'}")
+            logger.info("First trace vars keys: %s", list(first_trace_vars.keys()) if first_trace_vars else 'EMPTY')
 
         try:
-            narrative = _post_process_narrative(narrative, trace_data, normalized_data)
+            # Only the leading trace entries feed the fallbacks; slicing
+            # here keeps the worker thread from pinning a 10k-step trace
+            narrative = await asyncio.to_thread(_post_process_narrative, narrative, trace_data[:20], normalized_data)
         except Exception as post_err:
-            logger.error(f"Post-processing EXCEPTION: {post_err}")
+            logger.error("Post-processing EXCEPTION: %s", post_err)
             import traceback
             logger.error(traceback.format_exc())
-            # Continue with unprocessed narrative but try to fix empty data manually
+            # Continue with unprocessed narrative but try to fix empty data
+            # manually; post-processing never ran, so shuffle quizzes here
             for frame in narrative.get('frames', []):
                 if 'state' not in frame:
                     frame['state'] = {'visual_type': 'array', 'data': {}, 'highlights': []}
                 if not frame['state'].get('data'):
                     frame['state']['data'] = {'STEP': [frame.get('step_id', 0) + 1], 'STATUS': ['Processing']}
+                if frame.get('quiz'):
+                    _shuffle_quiz_options(frame['quiz'])
 
         frames_count = len(narrative.get('frames', []))
-        logger.info(f"Generated {frames_count} narrative frames")
+        logger.info("Generated %s narrative frames", frames_count)
 
         # Verify frames have data - AFTER post-processing
         logger.info("AFTER POST-PROCESS - Checking frames:")
         for idx, frame in enumerate(narrative.get('frames', [])[:3]):  # Log first 3 frames
             frame_data = frame.get('state', {}).get('data', {})
-            logger.info(f"  Frame {idx}: data keys = {list(frame_data.keys()) if frame_data else 'EMPTY'}")
+            logger.info("  Frame %s: data keys = %s", idx, list(frame_data.keys()) if frame_data else 'EMPTY')
 
         empty_count = sum(1 for f in narrative.get('frames', []) if not f.get('state', {}).get('data'))
         if empty_count > 0:
-            logger.error(f"CRITICAL: {empty_count} frames still have empty data after post-processing!")
+            logger.error("CRITICAL: %s frames still have empty data after post-processing!", empty_count)
         else:
-            logger.info(f"SUCCESS: All frames have data")
+            logger.info("SUCCESS: All frames have data")
 
         quizzes = [f for f in narrative.get('frames', []) if f.get('quiz')]
-        logger.info(f"Created {len(quizzes)} quizzes")
+        logger.info("Created %s quizzes", len(quizzes))
 
         # GUARANTEED QUIZ FIX - Ensure every quiz has a valid 'correct' field and is shuffled
-        print("=" * 60)
-        print("GUARANTEED QUIZ FIX - Running before return")
-        print("=" * 60)
-        for idx, frame in enumerate(narrative.get('frames', [])):
-            quiz = frame.get('quiz')
-            if quiz:
-                print(f"Frame {idx} quiz keys: {list(quiz.keys())}")
-                if 'correct' not in quiz or quiz['correct'] is None:
-                    print(f"  FIXING: 'correct' missing, setting to 0")
-                    quiz['correct'] = 0
-                else:
-                    try:
-                        quiz['correct'] = int(quiz['correct'])
-                    except:
+        if any(f.get('quiz') for f in narrative.get('frames', [])):
+            for idx, frame in enumerate(narrative.get('frames', [])):
+                quiz = frame.get('quiz')
+                if quiz:
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("Frame %s quiz keys: %s", idx, list(quiz.keys()))
+                    if 'correct' not in quiz or quiz['correct'] is None:
+                        logger.debug("  FIXING: 'correct' missing, setting to 0")
                         quiz['correct'] = 0
+                    else:
+                        try:
+                            quiz['correct'] = int(quiz['correct'])
+                        except:
+                            quiz['correct'] = 0
 
-                # Shuffle options if not already shuffled (correct is still 0)
-                # This ensures variety in correct answer positions
-                if quiz['correct'] == 0 and len(quiz.get('options', [])) > 1:
-                    _shuffle_quiz_options(quiz)
+                    # _post_process_narrative has already validated and
+                    # shuffled each quiz; re-shuffling here just repeated the
+                    # classification work on every frame
 
-                print(f"  FINAL correct value: {quiz['correct']}")
+                    logger.debug("  FINAL correct value: %s", quiz['correct'])
 
         return narrative
 
@@ -379,45 +495,16 @@ async def run_narrator_with_provider(llm_provider, trace_data: list, algo_name:
         log_error_with_context(logger, e, {"algo_name": algo_name, "trace_steps": len(trace_data)})
 
         # Return fallback with proper data extraction
-        frames = []
-
         # Try to extract input data from first trace entry
+        # Single generator pass; strings stay strings until emission below
         input_data = None
-        if trace_data and len(trace_data) > 0:
+        if trace_data:
             first_vars = trace_data[0].get('vars', {})
-            for key, value in first_vars.items():
-                if isinstance(value, (list, str)) and len(value) > 0:
-                    input_data = list(value) if isinstance(value, str) else value
-                    break
+            input_data = next((v for v in first_vars.values() if isinstance(v, (list, str)) and v), None)
 
-        for i, t in enumerate(trace_data[:10]):
-            vars_data = t.get("vars", {})
-            highlights = t.get("highlights", [])
-            step_desc = t.get('step', f'Processing step {i + 1}')
+        frames = [_fallback_frame(i, t, input_data) for i, t in enumerate(itertools.islice(trace_data, 10))]
 
-            # Ensure we have meaningful data
-            if not vars_data or len(vars_data) == 0:
-                # Create fallback data with step info
-                vars_data = {'STEP': [i + 1], 'STATUS': [step_desc]}
-                # Add input data if available
-                if input_data:
-                    vars_data['INPUT_DATA'] = input_data
-
-            # Validate highlights reference existing keys
-            valid_highlights = []
-            for h in highlights:
-                base_key = h.split('[')[0] if '[' in h else h
-                if base_key in vars_data:
-                    valid_highlights.append(h)
-
-            frames.append({
-                "step_id": i,
-                "commentary": f"Step {i + 1}: {step_desc}",
-                "state": {"visual_type": "array", "data": vars_data, "highlights": valid_highlights},
-                "quiz": None
-            })
-
-        logger.info(f"Generated fallback with {len(frames)} frames")
+        logger.info("Generated fallback with %s frames", len(frames))
 
         return {
             "title": f"{algo_name} (Simplified View)",
@@ -427,6 +514,39 @@ async def run_narrator_with_provider(llm_provider, trace_data: list, algo_name:
             "frames": frames
         }
 
+def _frames_already_valid(frames: list, expected_input_keys: set) -> bool:
+    """Check whether every frame already satisfies the post-process invariants.
+
+    True only when each frame has non-empty dict data containing the
+    expected input variables, highlights that reference existing keys,
+    and a structurally sound quiz - i.e. the validators below would all
+    be no-ops. Short-circuits on the first offending frame.
+    """
+    for f in frames:
+        state = f.get('state')
+        if not isinstance(state, dict):
+            return False
+        data = state.get('data')
+        if not isinstance(data, dict) or not data:
+            return False
+        if expected_input_keys:
+            lower_keys = {k.lower() for k in data}
+            if not expected_input_keys <= lower_keys:
+                return False
+        highlights = state.get('highlights')
+        if not isinstance(highlights, list) or not highlights:
+            return False
+        if any(not (isinstance(h, str) and h.partition('[')[0] in data) for h in highlights):
+            return False
+        quiz = f.get('quiz')
+        if not (isinstance(quiz, dict) and quiz.get('question')
+                and isinstance(quiz.get('options'), list) and len(quiz['options']) >= 2
+                and isinstance(quiz.get('correct'), int)
+                and 0 <= quiz['correct'] < len(quiz['options'])):
+            return False
+    return True
+
+
 def _post_process_narrative(narrative: dict, raw_trace: list, normalized_data: dict = None) -> dict:
     """
     Post-process narrator output to ensure data quality and consistency
@@ -434,154 +554,210 @@ def _post_process_narrative(narrative: dict, raw_trace: list, normalized_data: d
 
     Args:
         narrative: LLM-generated narrative
-        raw_trace: Original trace data for reference
+        raw_trace: Leading entries of the original trace, for reference.
+            Callers pass a short head slice (the fallbacks only consult
+            the first entries) so the thread doesn't pin a huge trace.
 
     Returns:
         Enhanced narrative with validated data structures
     """
     # VERSION MARKER - This confirms the updated code is running
-    logger.info("=" * 50)
     logger.info("POST-PROCESS v2026-02-04-v6 (Input Data Fix) STARTING")
-    logger.info("=" * 50)
 
     frames = narrative.get('frames', [])
 
+    # Batched windowed narration returns frames grouped per window; flatten
+    # them in order, dropping duplicate step_ids from the window overlap
+    frames_per_window = narrative.pop('frames_per_window', None)
+    if frames_per_window:
+        merged = []
+        seen_steps = set()
+        for window_frames in frames_per_window:
+            if not isinstance(window_frames, list):
+                continue
+            for f in window_frames:
+                if not isinstance(f, dict):
+                    continue
+                sid = f.get('step_id')
+                if sid is not None and sid in seen_steps:
+                    continue
+                seen_steps.add(sid)
+                merged.append(f)
+        if merged:
+            frames = merged
+            narrative['frames'] = frames
+            logger.info("Flattened %s windows into %s frames", len(frames_per_window), len(frames))
+
+    # Quizzes generated by the separate flash-tier task arrive keyed by
+    # step_id; attach each to its frame before the validation loop below
+    separate_quizzes = narrative.pop('quizzes', None)
+    if separate_quizzes:
+        quiz_by_step = {}
+        for q in separate_quizzes:
+            if isinstance(q, dict) and q.get('step_id') is not None:
+                quiz_by_step[q['step_id']] = q
+        attached = 0
+        for frame in frames:
+            if not frame.get('quiz'):
+                q = quiz_by_step.get(frame.get('step_id'))
+                if q:
+                    frame['quiz'] = {k: v for k, v in q.items() if k != 'step_id'}
+                    attached += 1
+        logger.info("Attached %s separately generated quizzes by step_id", attached)
+
     # Ensure raw_trace is a list (handle None case)
     if raw_trace is None:
         raw_trace = []
         logger.warning("raw_trace is None, using empty list")
 
-    logger.info(f"Post-processing {len(frames)} frames with {len(raw_trace)} raw trace entries")
+    logger.info("Post-processing %s frames with %s raw trace entries", len(frames), len(raw_trace))
+
+    # Fast path: when the LLM returned a pristine narrative every
+    # validator below is a no-op, so skip straight to the quiz shuffle.
+    # The expected input keys mirror the extraction sources further down.
+    expected_input_keys = set()
+    if normalized_data and normalized_data.get('example_inputs'):
+        expected_input_keys.update(
+            k.lower() for k, v in normalized_data['example_inputs'][0].get('input_vars', {}).items()
+            if v is not None)
+    if raw_trace:
+        expected_input_keys.update(
+            k.lower() for k, v in raw_trace[0].get('vars', {}).items()
+            if isinstance(v, (list, str)) and v)
+    if frames and _frames_already_valid(frames, expected_input_keys):
+        for f in frames:
+            _shuffle_quiz_options(f['quiz'])
+        narrative['frames'] = frames
+        logger.info("Fast path: all %s frames already valid, skipped normalization", len(frames))
+        return narrative
 
     # Log first raw trace entry for debugging
     if raw_trace and len(raw_trace) > 0:
         first_trace = raw_trace[0]
-        logger.info(f"First raw trace entry keys: {list(first_trace.keys())}")
+        logger.info("First raw trace entry keys: %s", list(first_trace.keys()))
         first_vars = first_trace.get('vars', {})
-        logger.info(f"First raw trace vars: {list(first_vars.keys()) if first_vars else 'EMPTY'}")
+        logger.info("First raw trace vars: %s", list(first_vars.keys()) if first_vars else 'EMPTY')
 
-    # Validate and fix quiz data
-    for frame_idx, frame in enumerate(frames):
-        quiz = frame.get('quiz')
-        if quiz:
-            logger.info(f"Frame {frame_idx} has quiz: {quiz.get('question', 'NO QUESTION')[:50]}...")
-            logger.info(f"  ALL QUIZ KEYS: {list(quiz.keys())}")
-            logger.info(f"  Raw correct value: {quiz.get('correct')} (type: {type(quiz.get('correct')).__name__})")
-            logger.info(f"  Options count: {len(quiz.get('options', []))}")
-            # Log any field that might contain the correct answer
-            for key in quiz.keys():
-                if key not in ['question', 'options']:
-                    logger.info(f"  Field '{key}': {quiz[key]}")
-
-            # Ensure 'correct' exists and is an integer
-            original_correct = quiz.get('correct')
-
-            # Check if 'correct' is missing or None
-            if 'correct' not in quiz or quiz.get('correct') is None:
-                logger.warning(f"  Quiz missing 'correct' field! Defaulting to 0")
-                quiz['correct'] = 0
-            else:
-                try:
-                    quiz['correct'] = int(quiz['correct'])
-                except (ValueError, TypeError):
-                    logger.warning(f"  Could not convert correct '{original_correct}' to int, defaulting to 0")
-                    quiz['correct'] = 0  # Default to first option if invalid
-
-            # Also check for 'answer' field (some LLMs use this instead)
-            if quiz.get('correct') == 0 and 'answer' in quiz:
-                try:
-                    quiz['correct'] = int(quiz['answer'])
-                    logger.info(f"  Used 'answer' field instead: {quiz['correct']}")
-                except (ValueError, TypeError):
-                    pass
-
-            # Check for 'correctIndex' or 'correct_index' field
-            if quiz.get('correct') == 0:
-                for alt_key in ['correctIndex', 'correct_index', 'correctAnswer', 'correct_answer']:
-                    if alt_key in quiz:
-                        try:
-                            quiz['correct'] = int(quiz[alt_key])
-                            logger.info(f"  Used '{alt_key}' field instead: {quiz['correct']}")
-                            break
-                        except (ValueError, TypeError):
-                            pass
-
-            # Ensure we have exactly 4 options
-            options = quiz.get('options', [])
-            if len(options) < 4:
-                # Pad with realistic fallback options
-                fallback_options = [
-                    "None of the above",
-                    "Skip this step",
-                    "This step is not needed",
-                    "Cannot be determined",
-                    "All of the above",
-                    "Restart the algorithm",
-                    "Return an error",
-                    "Continue without changes"
-                ]
-                fallback_idx = 0
-                while len(options) < 4:
-                    # Add fallback options that aren't already in the list
-                    while fallback_idx < len(fallback_options) and fallback_options[fallback_idx] in options:
-                        fallback_idx += 1
-                    if fallback_idx < len(fallback_options):
-                        options.append(fallback_options[fallback_idx])
-                        fallback_idx += 1
-                    else:
-                        options.append(f"Alternative approach {len(options)}")
-                quiz['options'] = options
-            elif len(options) > 4:
-                # Truncate to 4 options
-                quiz['options'] = options[:4]
-                # Ensure correct index is still valid
-                if quiz['correct'] >= 4:
+    # Validate and fix quiz data - skipped outright when no frame
+    # carries a quiz (fallback quizzes are generated further down)
+    if any(f.get('quiz') for f in frames):
+        for frame_idx, frame in enumerate(frames):
+            quiz = frame.get('quiz')
+            if quiz:
+                # Per-frame quiz diagnostics - guarded so the key lists
+                # and slices are never built at production log levels
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Frame %s has quiz: %s...", frame_idx, quiz.get('question', 'NO QUESTION')[:50])
+                    logger.debug("  ALL QUIZ KEYS: %s", list(quiz.keys()))
+                    logger.debug("  Raw correct value: %s (type: %s)", quiz.get('correct'), type(quiz.get('correct')).__name__)
+                    logger.debug("  Options count: %s", len(quiz.get('options', [])))
+                    # Log any field that might contain the correct answer
+                    for key in quiz.keys():
+                        if key not in ('question', 'options'):
+                            logger.debug("  Field '%s': %s", key, quiz[key])
+
+                # Ensure 'correct' exists and is an integer
+                original_correct = quiz.get('correct')
+
+                # Check if 'correct' is missing or None
+                if 'correct' not in quiz or quiz.get('correct') is None:
+                    logger.warning("  Quiz missing 'correct' field! Defaulting to 0")
                     quiz['correct'] = 0
+                else:
+                    try:
+                        quiz['correct'] = int(quiz['correct'])
+                    except (ValueError, TypeError):
+                        logger.warning("  Could not convert correct '%s' to int, defaulting to 0", original_correct)
+                        quiz['correct'] = 0  # Default to first option if invalid
+
+                # Also check for 'answer' field (some LLMs use this instead)
+                if quiz.get('correct') == 0 and 'answer' in quiz:
+                    try:
+                        quiz['correct'] = int(quiz['answer'])
+                        logger.info("  Used 'answer' field instead: %s", quiz['correct'])
+                    except (ValueError, TypeError):
+                        pass
+
+                # Check for 'correctIndex' or 'correct_index' field
+                if quiz.get('correct') == 0:
+                    for alt_key in ['correctIndex', 'correct_index', 'correctAnswer', 'correct_answer']:
+                        if alt_key in quiz:
+                            try:
+                                quiz['correct'] = int(quiz[alt_key])
+                                logger.info("  Used '%s' field instead: %s", alt_key, quiz['correct'])
+                                break
+                            except (ValueError, TypeError):
+                                pass
+
+                # Ensure we have exactly 4 options
+                options = quiz.get('options', [])
+                if len(options) < 4:
+                    # Pad with realistic fallback options
+                    fallback_idx = 0
+                    while len(options) < 4:
+                        # Add fallback options that aren't already in the list
+                        while fallback_idx < len(_FALLBACK_QUIZ_OPTIONS) and _FALLBACK_QUIZ_OPTIONS[fallback_idx] in options:
+                            fallback_idx += 1
+                        if fallback_idx < len(_FALLBACK_QUIZ_OPTIONS):
+                            options.append(_FALLBACK_QUIZ_OPTIONS[fallback_idx])
+                            fallback_idx += 1
+                        else:
+                            options.append(f"Alternative approach {len(options)}")
+                    quiz['options'] = options
+                elif len(options) > 4:
+                    # Truncate to 4 options
+                    quiz['options'] = options[:4]
+                    # Ensure correct index is still valid
+                    if quiz['correct'] >= 4:
+                        quiz['correct'] = 0
 
-            # Validate correct index is within bounds
-            if quiz['correct'] < 0 or quiz['correct'] >= len(quiz['options']):
-                logger.warning(f"  Correct index {quiz['correct']} out of bounds, resetting to 0")
-                quiz['correct'] = 0
+                # Validate correct index is within bounds
+                if quiz['correct'] < 0 or quiz['correct'] >= len(quiz['options']):
+                    logger.warning("  Correct index %s out of bounds, resetting to 0", quiz['correct'])
+                    quiz['correct'] = 0
 
-            # VALIDATE quiz answer against frame data
-            frame_data = frame.get('state', {}).get('data', {})
-            commentary = frame.get('commentary', '')
-            _validate_quiz_answer(quiz, frame_data, commentary)
+                # VALIDATE quiz answer against frame data (state may be
+                # an explicit null at this point - it is normalized later)
+                frame_data = (frame.get('state') or {}).get('data', {})
+                commentary = frame.get('commentary', '')
+                _validate_quiz_answer(quiz, frame_data, commentary)
 
-            # Shuffle options to randomize correct answer position
-            _shuffle_quiz_options(quiz)
+                # Shuffle options to randomize correct answer position
+                _shuffle_quiz_options(quiz)
 
-            # Final quiz state logging
-            logger.info(f"  FINAL quiz correct: {quiz['correct']} (options: {len(quiz['options'])})")
-            logger.info(f"  Correct answer: {quiz['options'][quiz['correct']][:50]}...")
+                # Final quiz state logging (guarded - slicing runs per frame)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("  FINAL quiz correct: %s (options: %s)", quiz['correct'], len(quiz['options']))
+                    logger.debug("  Correct answer: %s...", quiz['options'][quiz['correct']][:50])
 
     # Extract input data from multiple sources
     input_data = None
     input_data_dict = {}  # Store multiple input variables
 
     # Source 1: Try to get from normalized_data (original problem inputs)
-    logger.info("=" * 40)
-    logger.info("EXTRACTING INPUT DATA FROM normalized_data")
+    logger.debug("EXTRACTING INPUT DATA FROM normalized_data")
     if normalized_data is None:
         logger.warning("normalized_data is None!")
         normalized_data = {}
     else:
-        logger.info(f"normalized_data keys: {list(normalized_data.keys())}")
+        logger.info("normalized_data keys: %s", list(normalized_data.keys()))
 
     if normalized_data:
         example_inputs = normalized_data.get('example_inputs', [])
-        logger.info(f"example_inputs count: {len(example_inputs) if example_inputs else 0}")
+        logger.info("example_inputs count: %s", len(example_inputs) if example_inputs else 0)
         if example_inputs and len(example_inputs) > 0:
-            logger.info(f"First example_inputs entry: {example_inputs[0]}")
+            logger.info("First example_inputs entry: %s", example_inputs[0])
             input_vars = example_inputs[0].get('input_vars', {})
-            logger.info(f"input_vars: {input_vars}")
+            logger.info("input_vars: %s", input_vars)
             for key, value in input_vars.items():
                 if value is not None:
                     input_data_dict[key.upper()] = value
-                    logger.info(f"  Added to input_data_dict: {key.upper()} = {str(value)[:100]}")
+                    logger.info("  Added to input_data_dict: %s = %s", key.upper(), str(value)[:100])
                     if input_data is None and isinstance(value, (list, str)) and len(value) > 0:
-                        input_data = list(value) if isinstance(value, str) else value
-                        logger.info(f"  Set input_data from '{key}': type={type(value).__name__}, len={len(value)}")
+                        # Copy lists too - aliasing the source would let
+                        # later frame mutations leak back into input_vars
+                        input_data = list(value) if isinstance(value, str) else value.copy()
+                        logger.info("  Set input_data from '%s': type=%s, len=%s", key, type(value).__name__, len(value))
 
     # Source 2: Try to get from raw trace first entry
     if raw_trace and len(raw_trace) > 0:
@@ -592,24 +768,36 @@ def _post_process_narrative(narrative: dict, raw_trace: list, normalized_data: d
                 if key_upper not in input_data_dict:
                     input_data_dict[key_upper] = value
                 if input_data is None:
-                    input_data = list(value) if isinstance(value, str) else value
-                    logger.info(f"Extracted input '{key}' from raw trace: {type(value)}")
+                    input_data = list(value) if isinstance(value, str) else value.copy()
+                    logger.info("Extracted input '%s' from raw trace: %s", key, type(value))
 
-    logger.info("=" * 40)
-    logger.info("INPUT DATA EXTRACTION SUMMARY")
+    logger.debug("INPUT DATA EXTRACTION SUMMARY")
     if input_data:
-        logger.info(f"  Primary input_data: type={type(input_data).__name__}, len={len(input_data) if input_data else 0}")
+        logger.info("  Primary input_data: type=%s, len=%s", type(input_data).__name__, len(input_data) if input_data else 0)
         if isinstance(input_data, (list, str)) and len(input_data) <= 50:
-            logger.info(f"  Primary input_data value: {input_data}")
+            logger.info("  Primary input_data value: %s", input_data)
     else:
         logger.warning("  No primary input_data extracted!")
 
-    logger.info(f"  Input data dict ({len(input_data_dict)} keys): {list(input_data_dict.keys())}")
+    logger.info("  Input data dict (%s keys): %s", len(input_data_dict), list(input_data_dict.keys()))
     for k, v in input_data_dict.items():
         v_str = str(v)[:50] + "..." if len(str(v)) > 50 else str(v)
-        logger.info(f"    {k}: {v_str}")
-    logger.info("=" * 40)
-
+        logger.debug("    %s: %s", k, v_str)
+
+    # Lower the input keys once - the merge below runs per frame and only
+    # needs the precomputed lowered form
+    input_items = [(k, k.lower(), v) for k, v in input_data_dict.items()]
+
+    # Invariant across frames; built once so the fallback branches below
+    # collapse to a single dict update per frame
+    input_update = {'INPUT_DATA': input_data} if input_data else None
+
+    # Single fused pass: data normalization, guaranteed fallback, quiz
+    # generation and the validation counters all happen per frame instead
+    # of re-walking the frame list once per concern
+    last_idx = len(frames) - 1
+    empty_frames = []
+    frames_with_quiz = 0
     for frame_idx, frame in enumerate(frames):
         # Ensure state exists
         if 'state' not in frame or frame['state'] is None:
@@ -628,31 +816,34 @@ def _post_process_narrative(narrative: dict, raw_trace: list, normalized_data: d
                 if converted_data:
                     state['data'] = converted_data
                     del state['data_entries']
-                    logger.debug(f"Frame {frame_idx}: Converted data_entries to data dict")
+                    logger.debug("Frame %s: Converted data_entries to data dict", frame_idx)
             except Exception as e:
-                logger.warning(f"Frame {frame_idx}: Failed to convert data_entries: {e}")
+                logger.warning("Frame %s: Failed to convert data_entries: %s", frame_idx, e)
 
         # Get data (or empty dict if missing)
         data = state.get('data', {})
 
         # Ensure data is a dict
         if not isinstance(data, dict):
-            logger.warning(f"Frame {frame_idx}: data is not a dict ({type(data)}), resetting to empty")
+            logger.warning("Frame %s: data is not a dict (%s), resetting to empty", frame_idx, type(data))
             data = {}
 
         # Ensure input data is present in every frame
-        # Add all extracted input variables to the frame
+        # One normalized key view per frame serves every check below instead
+        # of re-lowercasing the dict keys per input variable
+        lower_keys = {k.lower() for k in data}
         added_inputs = []
-        for input_key, input_value in input_data_dict.items():
+        for input_key, input_key_lower, input_value in input_items:
             # Only add if not already present (case-insensitive check)
-            if not any(input_key.lower() == k.lower() for k in data.keys()):
+            if input_key_lower not in lower_keys:
                 data[input_key] = input_value
+                lower_keys.add(input_key_lower)
                 added_inputs.append(input_key)
         if added_inputs and frame_idx == 0:  # Log only for first frame to avoid spam
-            logger.info(f"Frame 0: Added input keys from normalized_data: {added_inputs}")
+            logger.info("Frame 0: Added input keys from normalized_data: %s", added_inputs)
 
         # Fallback: if still no input-related data, add generic input
-        if input_data and not any('INPUT' in key.upper() or 'S' == key.upper() or 'STR' in key.upper() for key in data.keys()):
+        if input_data and not any('input' in k or k == 's' or 'str' in k for k in lower_keys):
             if isinstance(input_data, list) and all(isinstance(x, str) and len(x) == 1 for x in input_data):
                 data['INPUT_STRING'] = input_data
             elif isinstance(input_data, str):
@@ -662,251 +853,126 @@ def _post_process_narrative(narrative: dict, raw_trace: list, normalized_data: d
 
         # Ensure data has at least some content
         if not data or len(data) == 0:
-            logger.warning(f"Frame {frame_idx}: Empty data detected, attempting fallback")
+            logger.warning("Frame %s: Empty data detected, attempting fallback", frame_idx)
 
-            # Fallback to raw trace data for this frame
-            if len(raw_trace) > 0:
-                # Try to find a trace entry with data
+            # Fallback to raw trace data for this frame: prefer the
+            # aligned entry, else take the first of the leading ten with
+            # vars - one short-circuiting pass, no sliced list copy
+            if raw_trace:
                 trace_idx = min(frame_idx, len(raw_trace) - 1)
-                raw_vars = raw_trace[trace_idx].get('vars', {})
-
-                if raw_vars and len(raw_vars) > 0:
-                    data = dict(raw_vars)  # Make a copy
-                    logger.info(f"Frame {frame_idx}: Used raw trace vars from step {trace_idx}")
-                else:
-                    # Try to find ANY trace entry with data
-                    for i, t in enumerate(raw_trace[:10]):  # Check first 10 entries
-                        t_vars = t.get('vars', {})
-                        if t_vars and len(t_vars) > 0:
-                            data = dict(t_vars)
-                            logger.info(f"Frame {frame_idx}: Used raw trace vars from step {i}")
-                            break
-
-            # If still no data, create minimal fallback
+                raw_vars = raw_trace[trace_idx].get('vars')
+                if not raw_vars:
+                    trace_idx, raw_vars = next(
+                        ((i, t['vars']) for i, t in enumerate(itertools.islice(raw_trace, 10))
+                         if t.get('vars')),
+                        (trace_idx, None))
+                if raw_vars:
+                    # Alias rather than copy: nothing past this point
+                    # writes into data (the input merge ran before the
+                    # empty check), so the trace vars are safe to share
+                    data = raw_vars
+                    logger.info("Frame %s: Used raw trace vars from step %s", frame_idx, trace_idx)
+
+            # If still no data, create minimal fallback (GUARANTEED FIX -
+            # this is the last resort, so data is non-empty from here on)
             if not data or len(data) == 0:
                 step_desc = frame.get('commentary', f'Processing step {frame_idx + 1}')
                 if len(step_desc) > 50:
                     step_desc = step_desc[:50] + '...'
                 data = {'STEP': [frame_idx + 1], 'STATUS': [step_desc]}
                 # Add input data if we have it
-                if input_data:
-                    data['INPUT_DATA'] = input_data
-                logger.warning(f"Frame {frame_idx}: Created minimal fallback data")
-
-        # Validate highlights reference existing keys
-        highlights = state.get('highlights', [])
-        if not isinstance(highlights, list):
-            highlights = []
-
-        valid_highlights = []
-        for h in highlights:
-            if not isinstance(h, str):
-                continue
-            # Check if highlight refers to a valid key or index
-            base_key = h.split('[')[0] if '[' in h else h
-            if base_key in data:
-                valid_highlights.append(h)
+                if input_update is not None:
+                    data.update(input_update)
+                logger.warning("Frame %s: Created minimal fallback data", frame_idx)
+
+        # Validate highlights reference existing keys. EAFP: iterate
+        # whatever the LLM returned and let a non-iterable container fall
+        # through to empty instead of type-checking it up front.
+        # Single pass over a frozen key set; partition avoids the list
+        # allocation split('[') makes for every highlight
+        data_keys = frozenset(data)
+        try:
+            valid_highlights = [h for h in state.get('highlights', ())
+                                if isinstance(h, str) and h.partition('[')[0] in data_keys]
+        except TypeError:
+            valid_highlights = []
 
         # If no valid highlights but we have data, highlight the first key
         if not valid_highlights and data:
-            first_key = list(data.keys())[0]
-            valid_highlights = [first_key]
+            valid_highlights = [next(iter(data))]
 
         state['highlights'] = valid_highlights
-        state['data'] = data
-        frame['state'] = state
-
-        # Log the final state of this frame
-        logger.debug(f"Frame {frame_idx}: Final data keys: {list(data.keys())}, highlights: {valid_highlights}")
+        if state.get('data') is not data:
+            state['data'] = data
 
-    narrative['frames'] = frames
+        # Log the final state of this frame (guarded - runs per frame)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Frame %s: Final data keys: %s, highlights: %s", frame_idx, list(data.keys()), valid_highlights)
 
-    # GUARANTEED FINAL FIX - Force data into any frame that still has empty data
-    for idx, frame in enumerate(frames):
-        frame_data = frame.get('state', {}).get('data', {})
-        if not frame_data or len(frame_data) == 0:
-            logger.error(f"GUARANTEED FIX: Frame {idx} still has empty data, forcing fallback")
-            # Force create state if missing
-            if 'state' not in frame:
-                frame['state'] = {'visual_type': 'array', 'highlights': []}
-            # Force create data
-            frame['state']['data'] = {
-                'STEP': [idx + 1],
-                'INFO': [f'Frame {idx + 1}'],
-                'STATUS': ['Visualization data unavailable']
-            }
-            # Add input_data if we extracted it
-            if input_data:
-                frame['state']['data']['INPUT_DATA'] = input_data
-            logger.info(f"GUARANTEED FIX: Frame {idx} now has data: {list(frame['state']['data'].keys())}")
-
-    # GUARANTEED QUIZ FIX - Ensure every frame has a quiz
-    for idx, frame in enumerate(frames):
+        # GUARANTEED QUIZ FIX - Ensure every frame has a quiz
         if not frame.get('quiz'):
             # Generate a default quiz based on the frame's commentary
-            commentary = frame.get('commentary', f'Step {idx + 1}')
+            commentary = frame.get('commentary', f'Step {frame_idx + 1}')
             # Extract a short description from commentary
-            short_desc = commentary.replace('##', '').replace('#', '').strip()
+            short_desc = commentary.translate(_HASH_TABLE).strip()
             if len(short_desc) > 60:
                 short_desc = short_desc[:60] + '...'
 
             # Create contextual quiz options based on frame position
-            if idx == 0:
-                frame['quiz'] = {
-                    'question': 'What is the first step in this algorithm?',
-                    'options': [
-                        f'Initialize variables and set up data structures',
-                        'Start processing from the end',
-                        'Skip initialization and process directly',
-                        'Return immediately without processing'
-                    ],
-                    'correct': 0
-                }
-            elif idx == len(frames) - 1:
-                frame['quiz'] = {
-                    'question': 'What happens in this final step?',
-                    'options': [
-                        'Return the computed result',
-                        'Continue iterating indefinitely',
-                        'Discard all computed values',
-                        'Restart the algorithm from beginning'
-                    ],
-                    'correct': 0
-                }
+            if frame_idx == 0:
+                question, quiz_options = _FIRST_QUIZ_QUESTION, list(_FIRST_QUIZ_OPTIONS)
+            elif frame_idx == last_idx:
+                question, quiz_options = _LAST_QUIZ_QUESTION, list(_LAST_QUIZ_OPTIONS)
             else:
-                frame['quiz'] = {
-                    'question': f'What is the purpose of this step?',
-                    'options': [
-                        short_desc if short_desc else 'Process the current element',
-                        'Skip this element and move to next',
-                        'Undo the previous operation',
-                        'Terminate early with partial result'
-                    ],
-                    'correct': 0
-                }
+                question, quiz_options = _MID_QUIZ_QUESTION, list(_MID_QUIZ_OPTIONS)
+                if short_desc:
+                    quiz_options[0] = short_desc
+            frame['quiz'] = {'question': question, 'options': quiz_options, 'correct': 0}
             # Shuffle the fallback quiz options
             _shuffle_quiz_options(frame['quiz'])
-            logger.info(f"Generated fallback quiz for frame {idx}")
+            logger.info("Generated fallback quiz for frame %s", frame_idx)
+
+        # Validation counters (the separate final pass is folded in here)
+        if not data:
+            empty_frames.append(frame_idx)
+        if frame.get('quiz'):
+            frames_with_quiz += 1
+
+    narrative['frames'] = frames
 
-    # Final validation
-    empty_frames = [i for i, f in enumerate(frames) if not f.get('state', {}).get('data')]
     if empty_frames:
-        logger.error(f"CRITICAL: Still have empty frames after guaranteed fix: {empty_frames}")
+        logger.error("CRITICAL: Still have empty frames after guaranteed fix: %s", empty_frames)
     else:
-        logger.info(f"Post-processing complete: All {len(frames)} frames have valid data")
+        logger.info("Post-processing complete: All %s frames have valid data", len(frames))
 
-    frames_with_quiz = sum(1 for f in frames if f.get('quiz'))
-    logger.info(f"Quiz coverage: {frames_with_quiz}/{len(frames)} frames have quizzes")
+    logger.info("Quiz coverage: %s/%s frames have quizzes", frames_with_quiz, len(frames))
 
-    logger.info("=" * 50)
     logger.info("POST-PROCESS v2026-02-04 COMPLETE")
-    logger.info("=" * 50)
 
     return narrative
 
-async def run_narrator(trace_data: list, algo_name: str, normalized_data: dict = None, blueprint: dict = None) -> dict:
-    """
-    Transform raw execution trace into educational narrative
-
-    Args:
-        trace_data: Raw trace from tracer agent
-        algo_name: Algorithm name
-        normalized_data: Original problem analysis (includes example_inputs, objectives, constraints)
-        blueprint: Algorithm selection rationale (includes options and trade-offs)
-
-    Returns:
-        Complete trace data with frames, commentary, and quizzes
-    """
-    logger.info(f"Generating narrative for: {algo_name}")
-
-    # Log context availability
-    if normalized_data:
-        logger.info("✓ Has normalized_data context (problem objectives, example inputs)")
-        if normalized_data.get('example_inputs'):
-            logger.info(f"  - Example inputs: {normalized_data['example_inputs'][0].get('input_vars', {})}")
-    else:
-        logger.warning("⚠️  No normalized_data context available")
-
-    if blueprint:
-        logger.info("✓ Has blueprint context (algorithm selection rationale)")
-    else:
-        logger.warning("⚠️  No blueprint context available")
 
-    if not trace_data:
-        logger.warning("⚠️  No trace data provided")
-        return {
-            "title": f"{algo_name} (No Execution Trace)",
-            "strategy": algo_name,
-            "strategy_details": "No execution trace was captured to narrate.",
-            "complexity": {
-                "algorithm_name": algo_name,
-                "time": {
-                    "best": "N/A",
-                    "average": "N/A",
-                    "worst": "N/A",
-                    "explanation": "No execution trace was captured.",
-                    "comparison_data": []
-                },
-                "space": {
-                    "complexity": "N/A",
-                    "explanation": "No execution trace was captured.",
-                    "variables": []
-                }
-            },
-            "frames": []
-        }
-
-    logger.info(f"Processing {len(trace_data)} trace steps")
-
-    # Limit trace data sent to LLM to avoid token limits
-    trace_preview = trace_data[:20]
-    logger.debug(f"Sending first {len(trace_preview)} steps to LLM")
-
-    # Build context sections for richer commentary
-    problem_context = ""
-    if normalized_data:
-        objective = normalized_data.get('objective', 'N/A')
-        example_inputs = normalized_data.get('example_inputs', [])
-
-        problem_context = f"""
-    ═══════════════════════════════════════════════════════════════
-    📋 PROBLEM CONTEXT (Use this to enrich your commentary!)
-    ═══════════════════════════════════════════════════════════════
-
-    Problem Objective: {objective}
-
-    Example Inputs from Problem Statement:
-    {json.dumps(example_inputs, indent=2) if example_inputs else 'No specific examples provided'}
-
-    In your commentary, reference these example inputs!
-    Example: "We're processing the input '42' from Example 1..."
-
-    ═══════════════════════════════════════════════════════════════
-    """
 
-    algorithm_context = ""
-    if blueprint:
-        analysis = blueprint.get('analysis_summary', '')
-        algorithm_context = f"""
-    ═══════════════════════════════════════════════════════════════
-    🎯 ALGORITHM SELECTION CONTEXT
-    ═══════════════════════════════════════════════════════════════
-
-    Why This Algorithm Was Chosen:
-    {analysis}
+# Frozen at import: the narrator's instruction scaffold is invariant, so
+# each call interpolates only the trace, contexts and algorithm name via
+# format_map instead of rebuilding the multi-KB f-string.
+_NARRATOR_SYSTEM = """You are an expert Algorithms Professor creating educational algorithm visualizations.
+    Your goal is to synthesize raw execution traces into clear, hierarchical, step-by-step visualizations
+    that help students understand algorithm logic through rich visual representations."""
 
-    Use this in strategy_details to explain the algorithm selection!
+_PROVIDER_SYSTEM = """You are an expert Algorithms Professor creating educational algorithm visualizations.
+    Your goal is to synthesize raw execution traces into clear, step-by-step visualizations."""
 
-    ═══════════════════════════════════════════════════════════════
-    """
+_QUIZ_SYSTEM = """You are an expert Algorithms Professor writing prediction quizzes
+    that make students anticipate each major algorithm decision."""
 
-    system_instruction = """You are an expert Algorithms Professor creating educational algorithm visualizations.
-    Your goal is to synthesize raw execution traces into clear, hierarchical, step-by-step visualizations
-    that help students understand algorithm logic through rich visual representations."""
+_COMPLEXITY_SYSTEM = """You are an expert Algorithms Professor explaining time and space complexity
+    precisely but accessibly."""
 
-    prompt = f"""
+_NARRATOR_PROMPT_TMPL = """
     Algorithm: {algo_name}
-    Raw Execution Trace: {json.dumps(trace_preview, indent=2)}
+    Raw Execution Trace: {trace_block}
+    {windowing_note}
 
     {problem_context}
 
@@ -954,170 +1020,24 @@ async def run_narrator(trace_data: list, algo_name: str, normalized_data: dict =
          }}
        }}
 
-    5. **QUIZ GENERATION** - Create interactive quizzes at EVERY CRITICAL STEP:
-       - Place a quiz before EVERY major algorithm decision or state change
-       - EVERY frame MUST have a quiz - no exceptions
-       - Question format: "What should happen next?" or "Why does this work?"
-       - 3-4 options with ONE correct answer
-       - Make learners PREDICT the next action before revealing it
-       - Questions should test UNDERSTANDING, not memorization
-
-       QUIZ PLACEMENT EXAMPLES:
-       - Before expanding/moving pointers: "What should we do next?"
-       - Before swapping elements: "Should we swap these values?"
-       - Before updating result: "Is this a better solution?"
-       - At state transitions: "What state should we move to?"
-
-    EXAMPLE OUTPUT FORMAT (String Algorithm):
+    5. **QUIZZES** - Quizzes are generated separately; set "quiz": null on every frame.
+
+    OUTPUT SCHEMA (json_mode already enforces valid JSON):
     {{
       "title": "{algo_name} Visualization",
       "strategy": "{algo_name}",
-      "strategy_details": "Detailed explanation of algorithm approach, complexity analysis, and why this strategy works.",
+      "strategy_details": "why this strategy works, complexity reasoning",
       "complexity": {{
         "algorithm_name": "{algo_name}",
-        "time": {{
-          "best": "O(1)",
-          "average": "O(n)",
-          "worst": "O(n)",
-          "explanation": "Detailed explanation of why this algorithm has this time complexity. Reference the specific operations being performed.",
-          "comparison_data": [
-            {{"n": 100, "optimized": 10, "naive": 100}},
-            {{"n": 1000, "optimized": 20, "naive": 1000}},
-            {{"n": 10000, "optimized": 30, "naive": 10000}},
-            {{"n": 100000, "optimized": 40, "naive": 100000}},
-            {{"n": 1000000, "optimized": 50, "naive": 1000000}}
-          ]
-        }},
-        "space": {{
-          "complexity": "O(1)",
-          "explanation": "Description of memory usage and auxiliary space needed.",
-          "variables": ["var1", "var2", "var3"]
-        }},
-        "best_case_desc": "When this algorithm performs optimally",
-        "average_case_desc": "Typical performance for random inputs",
-        "worst_case_desc": "When this algorithm performs worst",
-        "math_insight": "Mathematical formula or derivation (optional)",
-        "key_takeaway": "A memorable summary of why this algorithm is efficient (optional)"
+        "time": {{"best": "O(...)", "average": "O(...)", "worst": "O(...)",
+                 "explanation": "...", "comparison_data": [{{"n": 100, "optimized": 10, "naive": 100}}]}},
+        "space": {{"complexity": "O(...)", "explanation": "...", "variables": ["..."]}}
       }},
-      "frames": [
-        {{
-          "step_id": 0,
-          "commentary": "## Step 1: Initialize Variables\\n\\nWe begin by setting up our input string and tracking pointers...",
-          "state": {{
-            "visual_type": "array",
-            "data": {{
-              "INPUT_S": ["b", "a", "b", "a", "d"],
-              "POINTERS": {{
-                "start": 0,
-                "end": 0
-              }},
-              "BEST_RANGE": {{
-                "length": 1,
-                "start_idx": 0
-              }}
-            }},
-            "highlights": ["INPUT_S", "POINTERS"]
-          }},
-          "quiz": null
-        }},
-        {{
-          "step_id": 1,
-          "commentary": "## Step 2: Expand Around Center\\n\\nWe check if characters match...",
-          "state": {{
-            "visual_type": "array",
-            "data": {{
-              "INPUT_S": ["b", "a", "b", "a", "d"],
-              "CHECKING": {{
-                "left": 0,
-                "right": 2,
-                "current_center": 1
-              }},
-              "BEST_RANGE": {{
-                "length": 3,
-                "start_idx": 0
-              }}
-            }},
-            "highlights": ["INPUT_S[0]", "INPUT_S[2]", "CHECKING"]
-          }},
-          "quiz": {{
-            "question": "Why do we expand around each center instead of checking all substrings?",
-            "options": [
-              "It reduces time complexity from O(n³) to O(n²)",
-              "It uses less memory",
-              "It's easier to implement",
-              "It handles edge cases better"
-            ],
-            "correct": 0
-          }}
-        }},
-        {{
-          "step_id": 2,
-          "commentary": "## Step 3: Check Next Character\\n\\nNow we need to decide what to do with the next character...",
-          "state": {{
-            "visual_type": "array",
-            "data": {{
-              "INPUT_S": ["b", "a", "b", "a", "d"],
-              "CURRENT_POS": 3,
-              "TEMP_RESULT": "aba"
-            }},
-            "highlights": ["INPUT_S[3]", "CURRENT_POS"]
-          }},
-          "quiz": {{
-            "question": "The next character is 'a'. What should we do?",
-            "options": [
-              "Include it in the current palindrome",
-              "Start a new palindrome from here",
-              "Compare it with the center character",
-              "Skip it and move to next position"
-            ],
-            "correct": 2
-          }}
-        }}
-      ]
-    }}
-
-    ADDITIONAL QUIZ EXAMPLES FOR DIFFERENT ALGORITHM TYPES:
-
-    For State Machine algorithms:
-    {{
-      "quiz": {{
-        "question": "Current state is START and we see digit '5'. What state should we transition to?",
-        "options": [
-          "DIGIT state - digits can start a number",
-          "SIGN state - we need a sign first",
-          "DECIMAL state - jump to decimal",
-          "REJECT - invalid input"
-        ],
-        "correct": 0
-      }}
-    }}
-
-    For Hash Map algorithms:
-    {{
-      "quiz": {{
-        "question": "We found value 3 at index 2. What should we store in the hash map?",
-        "options": [
-          "Store {{'3': 2}} - map value to index",
-          "Store {{2: '3'}} - map index to value",
-          "Store nothing - wait for duplicates",
-          "Store {{'3': [2]}} - map value to list of indices"
-        ],
-        "correct": 0
-      }}
-    }}
-
-    For Two Pointer algorithms:
-    {{
-      "quiz": {{
-        "question": "Left pointer at 0, right at 5. arr[0]=1, arr[5]=9. Sum=10, target=8. What next?",
-        "options": [
-          "Move left pointer right (sum too large)",
-          "Move right pointer left (sum too large)",
-          "Move both pointers (found answer)",
-          "Return false (no solution)"
-        ],
-        "correct": 1
-      }}
+      "frames": [{{"step_id": 0, "commentary": "## Step 1: ...",
+                  "state": {{"visual_type": "array|heap|map",
+                            "data": {{"INPUT_S": ["..."], "POINTERS": {{"start": 0}}}},
+                            "highlights": ["INPUT_S[0]", "POINTERS"]}},
+                  "quiz": null}}]
     }}
 
     NOW SYNTHESIZE THE PROVIDED TRACE INTO 10-15 HIGH-QUALITY VISUALIZATION FRAMES:
@@ -1125,51 +1045,363 @@ async def run_narrator(trace_data: list, algo_name: str, normalized_data: dict =
     - ALWAYS include the input array
     - Consolidate micro-steps into meaningful operations
     - Create rich, nested data structures
-    - Add a quiz to EVERY frame - each step must have a quiz
-    - IMPORTANT: Each quiz should appear BEFORE the step that reveals the answer
-      (e.g., Step 3 asks "What happens next?", Step 4 shows the answer)
-
-    QUIZ REQUIREMENT: EVERY SINGLE FRAME MUST HAVE A QUIZ. No frame should have "quiz": null.
-    Learners should actively predict what happens next at each major algorithm step.
+    - Set "quiz": null on every frame (quizzes are attached separately)
 
     Output valid JSON only.
     """
 
+
+
+@functools.lru_cache(maxsize=128)
+def _provider_prompt(algo_name: str, trace_block: str, multi_window: bool,
+                     objective: str, example_inputs_json: str, analysis: str) -> str:
+    """Assemble the provider-path narration prompt, memoized on its inputs.
+
+    Retry loops and repeat narrations of the same trace hand in identical
+    pre-serialized strings, so the context rendering and f-string assembly
+    run once per distinct narration instead of per call.
+    """
+    parts = []
+    if objective:
+        parts.append(f"Problem Objective: {objective}")
+    if example_inputs_json:
+        parts.append(f"Example Inputs: {example_inputs_json}")
+    problem_context = _render_ctx("PROBLEM CONTEXT", "\n    ".join(parts))
+    algorithm_context = _render_ctx(
+        "ALGORITHM SELECTION CONTEXT",
+        f"Why This Algorithm Was Chosen: {analysis}" if analysis else "")
+
+    windowing_note = """
+    MULTI-WINDOW TRACE: The trace above is split into overlapping windows.
+    Narrate ALL windows in order. In addition to the fields described below,
+    return a top-level field "frames_per_window": [[...frames for window 0...], ...].
+    Keep step_id numbering continuous across windows; do not repeat a step_id
+    for the overlapping steps at window boundaries.
+    """ if multi_window else ""
+
+    return f"""
+    Algorithm: {algo_name}
+    Raw Execution Trace: {trace_block}
+    {windowing_note}
+
+    {problem_context}
+    {algorithm_context}
+
+    REQUIREMENTS:
+    1. Create 10-15 LOGICAL frames (consolidate micro-steps)
+    2. Include INPUT data in EVERY frame
+    3. Add a quiz to EVERY frame - each step should test understanding
+    4. Use descriptive variable containers (INPUT_S, POINTERS, etc.)
+
+    Return JSON with: title, strategy, strategy_details, complexity, frames
+    Each frame: step_id, commentary, state (visual_type, data, highlights), quiz (optional)
+    """
+
+
+def _render_ctx(title: str, body: str) -> str:
+    """Render a titled prompt context section; an empty body renders nothing.
+
+    Optional sections should vanish entirely when the pipeline has no data
+    for them instead of leaving a header over a blank body in the prompt.
+    """
+    if not body.strip():
+        return ""
+    return f"\n    {title}:\n    {body}\n    "
+
+
+@functools.lru_cache(maxsize=64)
+def _problem_context_block(objective: str, example_inputs_json: str) -> str:
+    """Render the problem-context prompt block, cached per problem.
+
+    Repeated narrator runs on the same problem skip re-rendering; the
+    compact-serialized example_inputs doubles as the cache key. Returns
+    nothing when there is no objective and no examples to show.
+    """
+    if not objective and not example_inputs_json:
+        return ""
+    return f"""
+    ═══════════════════════════════════════════════════════════════
+    📋 PROBLEM CONTEXT (Use this to enrich your commentary!)
+    ═══════════════════════════════════════════════════════════════
+
+    Problem Objective: {objective or 'N/A'}
+
+    Example Inputs from Problem Statement:
+    {example_inputs_json or 'No specific examples provided'}
+
+    In your commentary, reference these example inputs!
+    Example: "We're processing the input '42' from Example 1..."
+
+    ═══════════════════════════════════════════════════════════════
+    """
+
+
+@functools.lru_cache(maxsize=64)
+def _algorithm_context_block(analysis: str) -> str:
+    """Render the algorithm-selection prompt block, cached per blueprint."""
+    if not analysis:
+        return ""
+    return f"""
+    ═══════════════════════════════════════════════════════════════
+    🎯 ALGORITHM SELECTION CONTEXT
+    ═══════════════════════════════════════════════════════════════
+
+    Why This Algorithm Was Chosen:
+    {analysis}
+
+    Use this in strategy_details to explain the algorithm selection!
+
+    ═══════════════════════════════════════════════════════════════
+    """
+
+
+async def _quiz_task(algo_name: str, trace_preview: list) -> list:
+    """Generate one prediction quiz per expected frame, keyed by step_id.
+
+    Runs on the flash tier concurrently with frame synthesis. Asks for
+    full per-step coverage so the post-processor's canned fallback
+    quizzes only fill genuine gaps; failures degrade to an empty list.
+    """
+    prompt = f"""
+    Algorithm: {algo_name}
+    Raw Execution Trace: {orjson.dumps(trace_preview).decode()}
+
+    The educational visualization of this algorithm has 10-15 logical
+    steps (step_id 0-14). Create ONE prediction-style quiz for EVERY
+    logical step, keyed to the step_id it appears at, so no step is left
+    without a quiz. Each question should make the learner PREDICT the
+    next action BEFORE it is revealed, with 4 options and ONE correct
+    answer. Test understanding, not memorization.
+
+    Return JSON: {{"quizzes": [{{"step_id": 0, "question": "...",
+    "options": ["...", "...", "...", "..."], "correct": 0}}]}}
+    """
     try:
-        logger.debug("Calling LLM (Pro tier) for narrative generation...")
-        response_text = await llm.call(prompt, system_instruction=system_instruction, json_mode=True, model_tier="pro")
+        response_text = await llm.call(prompt, system_instruction=_QUIZ_SYSTEM, json_mode=True, model_tier="flash")
+        quizzes = orjson.loads(response_text).get('quizzes', [])
+        return quizzes if isinstance(quizzes, list) else []
+    except Exception as e:
+        logger.warning("Quiz generation failed (%s), post-processor will fill in quizzes", e)
+        return []
+
+
+async def _complexity_task(algo_name: str) -> dict:
+    """Generate the complexity analysis block (flash tier).
+
+    Runs concurrently with frame synthesis; returns None on failure so the
+    frames task's own complexity block is kept.
+    """
+    prompt = f"""
+    Produce a complexity analysis for the algorithm: {algo_name}
+
+    Return JSON with a single top-level "complexity" object:
+    {{"complexity": {{
+      "algorithm_name": "{algo_name}",
+      "time": {{"best": "O(...)", "average": "O(...)", "worst": "O(...)",
+               "explanation": "...",
+               "comparison_data": [{{"n": 100, "optimized": 10, "naive": 100}}]}},
+      "space": {{"complexity": "O(...)", "explanation": "...", "variables": ["..."]}},
+      "best_case_desc": "...", "average_case_desc": "...", "worst_case_desc": "...",
+      "math_insight": "...", "key_takeaway": "..."
+    }}}}
+    """
+    try:
+        response_text = await llm.call(prompt, system_instruction=_COMPLEXITY_SYSTEM, json_mode=True, model_tier="flash")
+        complexity = orjson.loads(response_text).get('complexity')
+        return complexity if isinstance(complexity, dict) else None
+    except Exception as e:
+        logger.warning("Complexity generation failed (%s), keeping frames task's block", e)
+        return None
+
+
+async def run_narrator(trace_data: list, algo_name: str, normalized_data: dict = None, blueprint: dict = None) -> dict:
+    """
+    Transform raw execution trace into educational narrative
+
+    Args:
+        trace_data: Raw trace from tracer agent
+        algo_name: Algorithm name
+        normalized_data: Original problem analysis (includes example_inputs, objectives, constraints)
+        blueprint: Algorithm selection rationale (includes options and trade-offs)
+
+    Returns:
+        Complete trace data with frames, commentary, and quizzes
+    """
+    logger.info("Generating narrative for: %s", algo_name)
+
+    # Log context availability
+    if normalized_data:
+        logger.info("✓ Has normalized_data context (problem objectives, example inputs)")
+        if normalized_data.get('example_inputs'):
+            logger.info("  - Example inputs: %s", normalized_data['example_inputs'][0].get('input_vars', {}))
+    else:
+        logger.warning("⚠️  No normalized_data context available")
+
+    if blueprint:
+        logger.info("✓ Has blueprint context (algorithm selection rationale)")
+    else:
+        logger.warning("⚠️  No blueprint context available")
+
+    if not trace_data:
+        logger.warning("⚠️  No trace data provided")
+        return {
+            "title": f"{algo_name} (No Execution Trace)",
+            "strategy": algo_name,
+            "strategy_details": "No execution trace was captured to narrate.",
+            "complexity": {
+                "algorithm_name": algo_name,
+                "time": {
+                    "best": "N/A",
+                    "average": "N/A",
+                    "worst": "N/A",
+                    "explanation": "No execution trace was captured.",
+                    "comparison_data": []
+                },
+                "space": {
+                    "complexity": "N/A",
+                    "explanation": "No execution trace was captured.",
+                    "variables": []
+                }
+            },
+            "frames": []
+        }
+
+    cache_key = _narrative_cache_key(algo_name, trace_data, normalized_data, blueprint)
+    if cache_key is not None:
+        cached = _narrative_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Narrative cache hit for %s - skipping LLM", algo_name)
+            # Entries are stored serialized; deserializing per hit hands
+            # every caller an isolated copy it is free to mutate
+            return orjson.loads(cached)
+
+    logger.info("Processing %s trace steps", len(trace_data))
+
+    # Window the trace instead of truncating: every window rides in the
+    # same LLM call, so long traces keep their later steps without paying
+    # one round-trip per window
+    windows = _trace_windows(trace_data)
+    trace_preview = windows[0]
+    logger.debug("Sending %s trace window(s) to LLM", len(windows))
+
+    # Build context sections for richer commentary (compact JSON - every
+    # indent/newline in the prompt is a billable token). Both blocks are
+    # lazy: nothing is rendered or serialized when the source is absent,
+    # and the final template just interpolates the empty string.
+    problem_context = ""
+    if normalized_data:
+        example_inputs = normalized_data.get('example_inputs', [])
+        problem_context = _problem_context_block(
+            str(normalized_data.get('objective') or ''),
+            orjson.dumps(example_inputs).decode() if example_inputs else "")
 
-        narrative = json.loads(response_text)
-        logger.debug(f"LLM returned narrative with {len(narrative.get('frames', []))} frames")
+    algorithm_context = ""
+    if blueprint:
+        algorithm_context = _algorithm_context_block(blueprint.get('analysis_summary', ''))
+
+
+    # Compact orjson output: faster than indented stdlib json and the
+    # smaller prompt costs fewer tokens per narration
+    if len(windows) > 1:
+        trace_block = orjson.dumps({"windows": windows}).decode()
+        windowing_note = """
+    MULTI-WINDOW TRACE: The trace above is split into overlapping windows.
+    Narrate ALL windows in order. In addition to the fields described below,
+    return a top-level field "frames_per_window": [[...frames for window 0...], ...].
+    Keep step_id numbering continuous across windows; do not repeat a step_id
+    for the overlapping steps at window boundaries.
+    """
+    else:
+        trace_block = orjson.dumps(trace_preview).decode()
+        windowing_note = ""
+
+    prompt = _NARRATOR_PROMPT_TMPL.format_map({
+        "algo_name": algo_name,
+        "trace_block": trace_block,
+        "windowing_note": windowing_note,
+        "problem_context": problem_context,
+        "algorithm_context": algorithm_context,
+    })
+
+    # Most traces narrate fine on the cheaper, faster flash tier; only a
+    # structurally incomplete result escalates to pro
+    min_frames = min(5, len(trace_preview))
+
+    async def _frames_for_tier(tier):
+        logger.debug("Calling LLM (%s tier) for frame synthesis...", tier)
+        # Prefer the streaming API: chunks are accumulated as they arrive
+        # instead of the provider buffering the full multi-KB completion,
+        # with list-append + join avoiding quadratic string concatenation
+        stream = getattr(llm, 'stream', None)
+        if stream is not None:
+            chunks = []
+            async for chunk in stream(prompt, system_instruction=_NARRATOR_SYSTEM, json_mode=True, model_tier=tier):
+                chunks.append(chunk)
+            return orjson.loads("".join(chunks))
+        response_text = await llm.call(prompt, system_instruction=_NARRATOR_SYSTEM, json_mode=True, model_tier=tier)
+        return orjson.loads(response_text)
+
+    async def _frames_task():
+        result = await _frames_for_tier("flash")
+        if _narrative_looks_complete(result, min_frames):
+            return result
+        logger.info("Flash-tier narrative incomplete; escalating to pro tier")
+        return await _frames_for_tier("pro")
+
+    try:
+        # Frames, quizzes and complexity are independent - overlap their
+        # network round-trips; only the frame synthesis needs the Pro tier
+        narrative, quizzes, complexity = await asyncio.gather(
+            _frames_task(),
+            _quiz_task(algo_name, trace_preview),
+            _complexity_task(algo_name)
+        )
+        if complexity:
+            narrative['complexity'] = complexity
+        if quizzes:
+            narrative['quizzes'] = quizzes
+        logger.debug("LLM returned narrative with %s frames", len(narrative.get('frames', [])))
 
         # Log first frame structure for debugging
-        if narrative.get('frames'):
+        if narrative.get('frames') and logger.isEnabledFor(logging.DEBUG):
             first_frame = narrative['frames'][0]
             first_data = first_frame.get('state', {}).get('data', {})
-            logger.debug(f"First frame data keys before post-process: {list(first_data.keys()) if isinstance(first_data, dict) else 'not a dict'}")
+            logger.debug("First frame data keys before post-process: %s", list(first_data.keys()) if isinstance(first_data, dict) else 'not a dict')
 
         try:
-            # Post-process frames to ensure quality
-            narrative = _post_process_narrative(narrative, trace_data, normalized_data)
+            # Post-process frames to ensure quality - pure CPU work over the
+            # full frame list, so run it off the event loop
+            # Only the leading trace entries feed the fallbacks; slicing
+            # here keeps the worker thread from pinning a 10k-step trace
+            narrative = await asyncio.to_thread(_post_process_narrative, narrative, trace_data[:20], normalized_data)
         except Exception as post_err:
-            logger.error(f"Post-processing failed: {post_err}")
-            # Continue with unprocessed narrative but try to fix empty data manually
+            logger.error("Post-processing failed: %s", post_err)
+            # Continue with unprocessed narrative but try to fix empty data
+            # manually; post-processing never ran, so shuffle quizzes here
             for frame in narrative.get('frames', []):
                 if 'state' not in frame:
                     frame['state'] = {'visual_type': 'array', 'data': {}, 'highlights': []}
                 if not frame['state'].get('data'):
                     frame['state']['data'] = {'STEP': [frame.get('step_id', 0) + 1], 'STATUS': ['Processing']}
+                if frame.get('quiz'):
+                    _shuffle_quiz_options(frame['quiz'])
 
         frames_count = len(narrative.get('frames', []))
-        logger.info(f"✓ Generated {frames_count} narrative frames")
+        logger.info("✓ Generated %s narrative frames", frames_count)
 
         # Verify frames have data
         empty_count = sum(1 for f in narrative.get('frames', []) if not f.get('state', {}).get('data'))
         if empty_count > 0:
-            logger.warning(f"Warning: {empty_count} frames still have empty data after post-processing")
+            logger.warning("Warning: %s frames still have empty data after post-processing", empty_count)
 
         quizzes = [f for f in narrative.get('frames', []) if f.get('quiz')]
-        logger.info(f"📝 Created {len(quizzes)} quizzes")
+        logger.info("📝 Created %s quizzes", len(quizzes))
+
+        if cache_key is not None:
+            try:
+                _narrative_cache.set(cache_key, orjson.dumps(narrative))
+            except TypeError:
+                logger.debug("Narrative not serializable; skipping cache store")
 
         return narrative
 
@@ -1178,49 +1410,16 @@ async def run_narrator(trace_data: list, algo_name: str, normalized_data: dict =
         log_error_with_context(logger, e, {"algo_name": algo_name, "trace_steps": len(trace_data) if trace_data else 0})
 
         # Return a skeleton based on the trace data with proper data extraction
-        frames = []
-
         # Try to extract input data from first trace entry
+        # Single generator pass; strings stay strings until emission below
         input_data = None
-        if trace_data and len(trace_data) > 0:
+        if trace_data:
             first_vars = trace_data[0].get('vars', {})
-            for key, value in first_vars.items():
-                if isinstance(value, (list, str)) and len(value) > 0:
-                    input_data = list(value) if isinstance(value, str) else value
-                    break
-
-        for i, t in enumerate(trace_data[:10]):
-            vars_data = t.get("vars", {})
-            highlights = t.get("highlights", [])
-            step_desc = t.get('step', f'Processing step {i + 1}')
-
-            # Ensure we have meaningful data
-            if not vars_data or len(vars_data) == 0:
-                # Create fallback data with step info
-                vars_data = {'STEP': [i + 1], 'STATUS': [step_desc]}
-                # Add input data if available
-                if input_data:
-                    vars_data['INPUT_DATA'] = input_data
+            input_data = next((v for v in first_vars.values() if isinstance(v, (list, str)) and v), None)
 
-            # Validate highlights reference existing keys
-            valid_highlights = []
-            for h in highlights:
-                base_key = h.split('[')[0] if '[' in h else h
-                if base_key in vars_data:
-                    valid_highlights.append(h)
-
-            frames.append({
-                "step_id": i,
-                "commentary": f"Step {i + 1}: {step_desc}",
-                "state": {
-                    "visual_type": "array",
-                    "data": vars_data,
-                    "highlights": valid_highlights
-                },
-                "quiz": None
-            })
+        frames = [_fallback_frame(i, t, input_data) for i, t in enumerate(itertools.islice(trace_data, 10))]
 
-        logger.info(f"Generated simplified fallback with {len(frames)} frames")
+        logger.info("Generated simplified fallback with %s frames", len(frames))
 
         return {
             "title": f"{algo_name} (Simplified View)",
@@ -1,5 +1,5 @@
 
-import json
+import orjson
 from app.utils.llm_provider import llm
 from app.utils.heuristics import consult_heuristics_db
 from app.utils.logger import get_logger, log_error_with_context
@@ -55,7 +55,7 @@ async def run_strategist_with_provider(llm_provider, normalized_data: dict) -> d
     system_instruction = "You are a Principal Software Architect specializing in Data Structures and Algorithms."
     prompt = f"""
     PROBLEM ANALYSIS:
-    {json.dumps(normalized_data, indent=2)}
+    {orjson.dumps(normalized_data).decode()}
 
     ENGINEERING HEURISTICS:
     {heuristics_advice}
@@ -82,7 +82,7 @@ async def run_strategist_with_provider(llm_provider, normalized_data: dict) -> d
         logger.debug("Calling LLM for strategy selection...")
         response_text = await llm_provider.call(prompt, system_instruction=system_instruction, json_mode=True)
 
-        blueprint = json.loads(response_text)
+        blueprint = orjson.loads(response_text)
 
         selected = blueprint.get('selected_strategy_for_instrumentation', 'Unknown')
         logger.info(f"Selected: {selected}")
@@ -155,7 +155,7 @@ async def run_strategist(normalized_data: dict) -> dict:
     system_instruction = "You are a Principal Software Architect specializing in Data Structures and Algorithms."
     prompt = f"""
     PROBLEM ANALYSIS:
-    {json.dumps(normalized_data, indent=2)}
+    {orjson.dumps(normalized_data).decode()}
 
     ENGINEERING HEURISTICS:
     {heuristics_advice}
@@ -184,7 +184,7 @@ async def run_strategist(normalized_data: dict) -> dict:
         logger.debug("Calling LLM (Pro tier) for strategy selection...")
         response_text = await llm.call(prompt, system_instruction=system_instruction, json_mode=True, model_tier="pro")
 
-        blueprint = json.loads(response_text)
+        blueprint = orjson.loads(response_text)
 
         selected = blueprint.get('selected_strategy_for_instrumentation', 'Unknown')
         logger.info(f"🎯 Selected: {selected}")
@@ -4,7 +4,7 @@ Survives server restarts by storing cache on disk.
 """
 
 import os
-import json
+import orjson
 import time
 import gzip
 from pathlib import Path
@@ -45,8 +45,8 @@ class FileCache:
         """Load metadata from disk."""
         if self._metadata_file.exists():
             try:
-                with open(self._metadata_file, 'r') as f:
-                    return json.load(f)
+                with open(self._metadata_file, 'rb') as f:
+                    return orjson.loads(f.read())
             except Exception as e:
                 logger.warning(f"Failed to load cache metadata: {e}")
         return {}
@@ -54,8 +54,8 @@ class FileCache:
     def _save_metadata(self) -> None:
         """Save metadata to disk."""
         try:
-            with open(self._metadata_file, 'w') as f:
-                json.dump(self._metadata, f)
+            with open(self._metadata_file, 'wb') as f:
+                f.write(orjson.dumps(self._metadata))
         except Exception as e:
             logger.error(f"Failed to save cache metadata: {e}")
 
@@ -95,11 +95,11 @@ class FileCache:
 
             try:
                 if self._compress:
-                    with gzip.open(file_path, 'rt', encoding='utf-8') as f:
-                        return json.load(f)
+                    with gzip.open(file_path, 'rb') as f:
+                        return orjson.loads(f.read())
                 else:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        return json.load(f)
+                    with open(file_path, 'rb') as f:
+                        return orjson.loads(f.read())
             except Exception as e:
                 logger.error(f"Failed to read cache file {key}: {e}")
                 return None
@@ -122,12 +122,13 @@ class FileCache:
 
             try:
                 # Write to temp file first (atomic write)
+                payload = orjson.dumps(value)
                 if self._compress:
-                    with gzip.open(temp_path, 'wt', encoding='utf-8') as f:
-                        json.dump(value, f)
+                    with gzip.open(temp_path, 'wb') as f:
+                        f.write(payload)
                 else:
-                    with open(temp_path, 'w', encoding='utf-8') as f:
-                        json.dump(value, f)
+                    with open(temp_path, 'wb') as f:
+                        f.write(payload)
 
                 # Rename to final path (atomic on most systems)
                 temp_path.replace(file_path)
@@ -1,6 +1,7 @@
 
 from fastapi import FastAPI, HTTPException, Request, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, field_validator
 from typing import Optional, Literal, List
 import re
@@ -10,6 +11,8 @@ import traceback
 import json
 import time
 
+import orjson
+
 from app.utils.request_context import RequestContext
 from app.utils.providers.factory import LLMProviderFactory
 from app.utils.credential_store import get_credential_store
@@ -552,6 +555,52 @@ async def learn_algorithm(request: UserRequest, req: Request, _: None = Depends(
 # Session Credential Management Endpoints (Phase 3: Secure Credential Storage)
 # =============================================================================
 
+@app.post("/learn/stream")
+async def learn_algorithm_stream(request: UserRequest, req: Request, _: None = Depends(rate_limit_analyze)):
+    """
+    LEARNING MODE (streaming): same flow as /learn, but phases arrive as
+    Server-Sent Events the moment each one completes instead of after all
+    three LLM calls finish.
+    """
+    session_id = req.headers.get("X-Session-ID", "anonymous")
+
+    logger.info("=" * 70)
+    logger.info(f"NEW LEARNING STREAM REQUEST")
+    logger.info(f"Problem: {request.problem_text[:100]}{'...' if len(request.problem_text) > 100 else ''}")
+    logger.info("=" * 70)
+
+    # Credential resolution mirrors /learn: request body > stored session > environment
+    if request.llm_config and request.llm_config.api_key:
+        context = RequestContext.from_request(request.llm_config.dict(), session_id)
+    elif session_id and session_id != "anonymous":
+        stored_creds = get_credential_store().get_credentials(session_id)
+        if stored_creds:
+            context = RequestContext.from_request(stored_creds, session_id)
+        else:
+            context = RequestContext.from_env(session_id)
+    else:
+        context = RequestContext.from_env(session_id)
+
+    logger.info(f"[{context.request_id}][{session_id[:8]}] Using provider: {context.provider}/{context.model}")
+    pipeline = Pipeline(context)
+
+    async def event_stream():
+        try:
+            async for event in pipeline.run_learning_stream(
+                problem_text=request.problem_text,
+                context_toggles=request.context_toggles
+            ):
+                yield f"data: {orjson.dumps(event).decode()}\n\n"
+        except Exception as e:
+            log_error_with_context(logger, e, {
+                "problem_text": request.problem_text[:100],
+                "context_toggles": request.context_toggles
+            })
+            yield f"data: {orjson.dumps({'phase': 'error', 'detail': 'Educational flow generation failed'}).decode()}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
 @app.post("/session/store-credentials")
 async def store_credentials_endpoint(request: StoreCredentialsRequest, req: Request, _: None = Depends(rate_limit_default)):
     """
@@ -685,6 +734,14 @@ async def startup_event():
 async def shutdown_event():
     logger.info("FastAPI server shutting down...")
 
+    # Let any fire-and-forget algorithm cache writes finish before exit
+    from app.agents.algorithm_explainer import flush_cache_writes
+    await flush_cache_writes()
+
+    # Release the pooled provider SDK connections
+    from app.utils.llm_provider import llm
+    llm.close()
+
 
 if __name__ == "__main__":
     import uvicorn
@@ -9,7 +9,7 @@ Now with Smart Routing for sub-second responses on cached/known algorithms!
 
 import time
 import json
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, Tuple, AsyncIterator
 
 from app.utils.request_context import RequestContext
 from app.utils.providers.factory import LLMProviderFactory
@@ -297,6 +297,42 @@ class Pipeline:
             })
             raise
 
+    async def run_learning_stream(
+        self,
+        problem_text: str,
+        context_toggles: list
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream the educational flow phase by phase.
+
+        Yields each {"phase": n, "data": ...} event from the generator as
+        it completes, then a final {"phase": "complete"} event carrying the
+        same _meta block run_learning attaches.
+        """
+        from app.agents.educational_flow_generator import stream_educational_flow_with_provider
+
+        logger.info(f"[{self.request_id}] Starting educational flow stream")
+
+        start = time.time()
+        async for event in stream_educational_flow_with_provider(
+            self.llm_provider,
+            problem_text,
+            context_toggles
+        ):
+            yield event
+        duration = time.time() - start
+
+        logger.info(f"[{self.request_id}] Educational flow stream completed in {duration:.2f}s")
+
+        yield {
+            "phase": "complete",
+            "_meta": {
+                'request_id': self.request_id,
+                'provider_used': self.context.provider,
+                'model_used': self.context.model
+            }
+        }
+
     async def get_algorithm_explanation(
         self,
         algorithm_name: str,
@@ -0,0 +1,103 @@
+"""
+Micro-batching coalescer for LLM calls.
+
+Under concurrent load (several students submitting problems at once) each
+request used to fire its own provider round-trip the moment it arrived.
+The batcher collects calls that land within a short window and dispatches
+them together with asyncio.gather, so connection setup and provider-side
+scheduling are shared across the batch and per-call Futures resolve as a
+group.
+
+Neither provider SDK wired into this app exposes an async batch endpoint,
+so dispatch is a gather fan-out rather than a /v1/batches upload; the
+coalescing window still bounds burst concurrency and keeps the dispatch
+path single.
+"""
+
+import asyncio
+from app.utils.logger import get_logger
+
+logger = get_logger("llm_batcher")
+
+# Collection window and batch cap - small enough to be invisible to an
+# interactive user, large enough to catch simultaneous submissions
+_WINDOW_SECONDS = 0.05
+_MAX_BATCH = 32
+
+
+class LLMBatcher:
+    """Coalesces concurrent LLM calls into windowed gather dispatches."""
+
+    def __init__(self, window: float = _WINDOW_SECONDS, max_batch: int = _MAX_BATCH):
+        self._window = window
+        self._max_batch = max_batch
+        self._queue: asyncio.Queue = None
+        self._loop = None
+        self._drain_task = None
+
+    async def submit(self, llm_provider, prompt: str, system_instruction: str = None,
+                     json_mode: bool = True, **kwargs) -> str:
+        """Enqueue one call and await its result.
+
+        Returns whatever the provider's call() returns; provider errors
+        propagate to the awaiting caller unchanged.
+        """
+        loop = asyncio.get_running_loop()
+        # The queue's waiters are bound to the loop that first used it;
+        # rebuild it if the process is now driven by a different loop
+        if self._queue is None or self._loop is not loop:
+            self._queue = asyncio.Queue()
+            self._loop = loop
+            self._drain_task = None
+        fut = loop.create_future()
+        await self._queue.put((fut, llm_provider, prompt, system_instruction, json_mode, kwargs))
+        if self._drain_task is None or self._drain_task.done():
+            self._drain_task = asyncio.create_task(self._drain())
+        return await fut
+
+    async def _drain(self):
+        """Drain the queue in windowed batches until it runs dry."""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                batch = [await asyncio.wait_for(self._queue.get(), timeout=self._window)]
+            except asyncio.TimeoutError:
+                # A submit() may have enqueued between the timeout firing
+                # and this task returning, while still observing the task
+                # as not done - returning then would strand its item. The
+                # emptiness check closes that window: completion is
+                # synchronous after return, so a non-empty queue here is
+                # picked up by this same drainer.
+                if not self._queue.empty():
+                    continue
+                return  # queue idle - next submit() restarts the drainer
+
+            deadline = loop.time() + self._window
+            while len(batch) < self._max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            if len(batch) > 1:
+                logger.info("Dispatching coalesced LLM batch of %d calls", len(batch))
+
+            results = await asyncio.gather(
+                *[provider.call(prompt, system_instruction, json_mode=json_mode, **kw)
+                  for _, provider, prompt, system_instruction, json_mode, kw in batch],
+                return_exceptions=True
+            )
+            for (fut, *_), result in zip(batch, results):
+                if fut.cancelled():
+                    continue
+                if isinstance(result, BaseException):
+                    fut.set_exception(result)
+                else:
+                    fut.set_result(result)
+
+
+# Process-wide batcher shared by all agents
+llm_batcher = LLMBatcher()
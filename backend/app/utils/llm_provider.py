@@ -1,3 +1,4 @@
+import asyncio
 import os
 import json
 from google import genai
@@ -18,6 +19,12 @@ class LLMProvider:
         self.azure_deployment = os.getenv("AZURE_DEPLOYMENT_NAME", "gpt-4o")
         self.gemini_key = os.getenv("API_KEY")
 
+        # SDK clients are built once on first use and reused across calls;
+        # constructing them per call paid a fresh TCP/TLS handshake on
+        # every request
+        self._azure_client = None
+        self._gemini_client = None
+
         logger.info("LLMProvider initialized")
         self._log_config_status()
 
@@ -42,16 +49,37 @@ class LLMProvider:
             return False
         return True
 
+    def _get_azure_client(self):
+        if self._azure_client is None:
+            self._azure_client = AzureOpenAI(
+                api_key=self.azure_key,
+                api_version=self.azure_version,
+                azure_endpoint=self.azure_endpoint
+            )
+        return self._azure_client
+
+    def _get_gemini_client(self):
+        if self._gemini_client is None:
+            self._gemini_client = genai.Client(api_key=self.gemini_key)
+        return self._gemini_client
+
+    def close(self):
+        """Release pooled SDK connections (called on app shutdown)."""
+        for attr in ("_azure_client", "_gemini_client"):
+            client = getattr(self, attr)
+            if client is not None:
+                try:
+                    client.close()
+                except Exception as e:
+                    logger.debug(f"Error closing {attr}: {e}")
+                setattr(self, attr, None)
+
     def _call_azure(self, prompt: str, system_instruction: str = None, json_mode: bool = True):
         
         logger.debug(f"Calling Azure OpenAI (model: {self.azure_deployment})")
 
         try:
-            client = AzureOpenAI(
-                api_key=self.azure_key,
-                api_version=self.azure_version,
-                azure_endpoint=self.azure_endpoint
-            )
+            client = self._get_azure_client()
 
             messages = []
             if system_instruction:
@@ -81,7 +109,7 @@ class LLMProvider:
         logger.debug(f"Calling Gemini (model: {model_name})")
 
         try:
-            client = genai.Client(api_key=self.gemini_key)
+            client = self._get_gemini_client()
 
             config = {}
             if system_instruction:
@@ -106,6 +134,111 @@ class LLMProvider:
             logger.error(f"[ERROR] Gemini call failed: {str(e)}")
             raise
 
+    def _stream_azure(self, prompt: str, system_instruction: str = None, json_mode: bool = True):
+
+        logger.debug(f"Streaming from Azure OpenAI (model: {self.azure_deployment})")
+
+        client = self._get_azure_client()
+
+        messages = []
+        if system_instruction:
+            messages.append({"role": "system", "content": system_instruction})
+        messages.append({"role": "user", "content": prompt})
+
+        response = client.chat.completions.create(
+            model=self.azure_deployment,
+            messages=messages,
+            response_format={"type": "json_object"} if json_mode else {"type": "text"},
+            temperature=0.3,
+            stream=True
+        )
+
+        for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def _stream_gemini(self, prompt: str, system_instruction: str = None, json_mode: bool = True, model_name: str = "gemini-2.5-flash"):
+
+        logger.debug(f"Streaming from Gemini (model: {model_name})")
+
+        client = self._get_gemini_client()
+
+        config = {}
+        if system_instruction:
+            config["system_instruction"] = system_instruction
+        if json_mode:
+            config["response_mime_type"] = "application/json"
+
+        for chunk in client.models.generate_content_stream(
+            model=model_name,
+            contents=prompt,
+            config=config
+        ):
+            if chunk.text:
+                yield chunk.text
+
+    async def _drain_stream(self, sync_gen):
+        """Drain a sync SDK stream chunk by chunk off the event loop.
+
+        The provider SDKs expose blocking generators; iterating them
+        inline would stall the loop for the whole generation, so each
+        next() runs in a worker thread.
+        """
+        sentinel = object()
+        it = iter(sync_gen)
+        while True:
+            chunk = await asyncio.to_thread(next, it, sentinel)
+            if chunk is sentinel:
+                return
+            yield chunk
+
+    async def stream(self, prompt: str, system_instruction: str = None, json_mode: bool = True, model_tier: str = "flash"):
+        """
+        Stream the LLM response as an async iterator of text chunks.
+
+        Lets callers start consuming/parsing output as it is generated
+        instead of waiting for the full buffered response. Falls back to a
+        single chunk from call() when no streaming backend is available.
+        Failover only happens while nothing has been yielded yet; once a
+        provider has produced output, a mid-stream failure re-raises so
+        consumers never see two providers' chunks concatenated.
+        """
+        logger.debug(f"LLM stream requested (tier: {model_tier}, json_mode: {json_mode})")
+
+        if self._is_valid_key(self.azure_key):
+            yielded = False
+            try:
+                logger.info("→ Streaming from Azure OpenAI...")
+                async for chunk in self._drain_stream(self._stream_azure(prompt, system_instruction, json_mode)):
+                    yielded = True
+                    yield chunk
+                return
+            except Exception as e:
+                log_error_with_context(logger, e, {"prompt_preview": prompt[:100]})
+                if yielded:
+                    logger.error("Azure stream failed mid-response; re-raising (partial output already consumed)")
+                    raise
+                logger.warning("Azure stream failed, falling back to Gemini")
+
+        if self._is_valid_key(self.gemini_key):
+            yielded = False
+            try:
+                logger.info(f"→ Streaming from Gemini ({model_tier} tier)...")
+                m_name = "gemini-2.5-flash" if model_tier == "flash" else "gemini-2.5-pro"
+                async for chunk in self._drain_stream(self._stream_gemini(prompt, system_instruction, json_mode, m_name)):
+                    yielded = True
+                    yield chunk
+                return
+            except Exception as e:
+                log_error_with_context(logger, e, {"prompt_preview": prompt[:100]})
+                if yielded:
+                    logger.error("Gemini stream failed mid-response; re-raising (partial output already consumed)")
+                    raise
+                logger.error("Gemini stream failed, falling back to mock response")
+
+        logger.warning("[WARNING]  All LLM providers failed - returning mock response")
+        yield self._generate_mock_response(system_instruction)
+
     async def call(self, prompt: str, system_instruction: str = None, json_mode: bool = True, model_tier: str = "flash"):
         
         logger.debug(f"LLM call requested (tier: {model_tier}, json_mode: {json_mode})")
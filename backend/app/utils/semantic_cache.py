@@ -0,0 +1,56 @@
+"""
+Semantic prompt cache for LLM phase generation.
+
+DSA problem statements repeat heavily ("Two Sum", "longest palindrome",
+copy-pasted LeetCode text), so identical prompts should not re-pay a full
+LLM round-trip. Lookups are keyed on a namespace plus an aggressively
+normalized form of the variable text - whitespace runs collapsed,
+lowercased - which folds trivially different pastes of the same problem
+onto one entry.
+
+Backed by the in-process MemoryCache (LRU + TTL), the same store used for
+algorithm explanations.
+"""
+
+import re
+from typing import Any, Optional
+
+from app.cache.memory_cache import MemoryCache
+from app.utils.logger import get_logger
+
+logger = get_logger("semantic_cache")
+
+_WS_RE = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace and case so near-identical pastes share a key."""
+    return _WS_RE.sub(' ', str(text).strip().lower())
+
+
+class SemanticCache:
+    """Namespaced cache over normalized prompt text."""
+
+    def __init__(self, max_size: int = 512, default_ttl: float = 3600):
+        self._cache = MemoryCache(max_size=max_size, default_ttl=default_ttl)
+
+    def _key(self, namespace: str, text: str) -> str:
+        return f"{namespace}:{normalize_text(text)}"
+
+    def get(self, namespace: str, text: str) -> Optional[Any]:
+        """Return the cached value for this namespace/text, or None."""
+        value = self._cache.get(self._key(namespace, text))
+        if value is not None:
+            logger.info("Semantic cache hit (%s)", namespace)
+        return value
+
+    def set(self, namespace: str, text: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a generated result under the normalized text key."""
+        self._cache.set(self._key(namespace, text), value, ttl)
+
+    def get_stats(self) -> dict:
+        return self._cache.get_stats()
+
+
+# Shared across agents - one process-wide cache keeps the hit rate high
+semantic_cache = SemanticCache()